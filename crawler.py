@@ -1,17 +1,160 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import ast
+import atexit
+import io
 import json
 import time
 import os
+import queue
 import re
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, fields, is_dataclass
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Union
 import logging
+import mmap
 from pathlib import Path
+from urllib.parse import urlencode
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+# _dumps_line 把一条记录序列化为以换行结尾的 UTF-8 字节，可直接写入二进制 JSONL 文件
+if orjson is not None:
+    def _dumps_line(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    _loads = orjson.loads
+else:
+    def _json_default(obj: Any) -> Dict[str, Any]:
+        if is_dataclass(obj):
+            return {field.name: getattr(obj, field.name) for field in fields(obj)}
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+    
+    def _dumps_line(obj: Any) -> bytes:
+        return (json.dumps(obj, ensure_ascii=False, default=_json_default) + '\n').encode('utf-8')
+    _loads = json.loads
+
+
+# 与 ast 模块一致的换行切分方式，保证行号对应
+_LINE_BREAK_BYTES_RE = re.compile(rb'\r\n|\r|\n')
+
+# 输出 JSONL 记录中的 repo_full_name 字段（json 与 orjson 两种输出格式都兼容）
+_REPO_FULL_NAME_RE = re.compile(rb'"repo_full_name":\s*"([^"]+)"')
+
+# diff 中 parse_diff_hunks 关心的行：hunk 头以及 +/-/空格 开头的变更和上下文行
+_DIFF_LINE_RE = re.compile(r'^[@+\- ].*', re.MULTILINE)
+
+# diff hunk 头，例如 "@@ -10,6 +10,7 @@ def foo():"
+_HUNK_HEADER_RE = re.compile(r'@@ -(\d+),?(\d+)? \+(\d+),?(\d+)? @@(.+)?')
+
+
+def _combine_patterns(patterns: List[Union[str, bytes]], flags: int) -> Tuple[re.Pattern, Dict[str, Tuple[int, int]]]:
+    """
+    将同一类别的多个正则合并为一个带命名分组的交替正则（支持 str 和 bytes 正则）
+    
+    Returns:
+        合并后的 Pattern，以及 {分组名: (子分组起始下标, 子分组结束下标)}，
+        用于从 match.groups() 中切出原始子正则自己的分组
+    """
+    is_bytes = bool(patterns) and isinstance(patterns[0], bytes)
+    parts = []
+    group_slices = {}
+    offset = 0
+    for i, pattern in enumerate(patterns):
+        name = f'p{i}'
+        group_count = re.compile(pattern).groups
+        if is_bytes:
+            parts.append(b'(?P<' + name.encode('ascii') + b'>' + pattern + b')')
+        else:
+            parts.append(f'(?P<{name}>{pattern})')
+        group_slices[name] = (offset + 1, offset + 1 + group_count)
+        offset += 1 + group_count
+    separator = b'|' if is_bytes else '|'
+    return re.compile(separator.join(parts), flags), group_slices
+
+
+def _derive_first_chars(patterns: List[str]) -> Optional[frozenset]:
+    """
+    推导一组行首锚定正则在 strip 后的行上可能出现的首字符
+    
+    任一正则不是以 ^\\s* 加字面字符开头时返回 None，表示无法据此预筛
+    """
+    prefix = r'^\s*'
+    first_chars = set()
+    for pattern in patterns:
+        if not pattern.startswith(prefix):
+            return None
+        first_char = pattern[len(prefix):len(prefix) + 1]
+        if not (first_char.isalnum() or first_char == '#'):
+            return None
+        first_chars.add(first_char)
+    return frozenset(first_chars)
+
+
+# LANGUAGE_CONFIG 中各类正则列表对应的合并正则前缀
+_PATTERN_CATEGORIES = {
+    'import_patterns': 'imports',
+    'function_patterns': 'functions',
+    'class_patterns': 'classes'
+}
+
+
+def _compile_language_config(language_config: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """将 LANGUAGE_CONFIG 中的正则字符串预编译为 Pattern 对象"""
+    compiled = {}
+    for language, config in language_config.items():
+        compiled[language] = {}
+        for key, patterns in config.items():
+            if not key.endswith('_patterns'):
+                continue
+            compiled[language][key] = [re.compile(pattern, re.MULTILINE) for pattern in patterns]
+            
+            # 每个类别额外生成一个合并正则，如 import_patterns -> imports_re / imports_groups
+            category = _PATTERN_CATEGORIES[key]
+            combined, group_slices = _combine_patterns(patterns, re.MULTILINE)
+            compiled[language][f'{category}_re'] = combined
+            compiled[language][f'{category}_groups'] = group_slices
+        
+        # extract_imports 直接扫描原始字节，导入相关的正则和前缀另备一份 bytes 版本；
+        # 该版本只用于已 strip 的行，去掉行首的 ^\s* 并配合 match 使用，省去无谓的回溯
+        imports_bytes_re, _ = _combine_patterns(
+            [pattern.removeprefix(r'^\s*').encode('ascii') for pattern in config['import_patterns']],
+            re.MULTILINE
+        )
+        compiled[language]['imports_bytes_re'] = imports_bytes_re
+        first_chars = _derive_first_chars(config['import_patterns'])
+        compiled[language]['import_first_chars_bytes'] = (
+            frozenset(char.encode('ascii') for char in first_chars) if first_chars is not None else None
+        )
+        compiled[language]['comment_prefixes_bytes'] = tuple(
+            prefix.encode('ascii')
+            for prefix in config['line_comment_prefixes'] + config['block_comment_starts']
+        )
+        # (块注释起始符, 结束符)：/* 以 */ 结束，Python 的三引号以相同的三引号结束
+        compiled[language]['block_comment_pairs_bytes'] = tuple(
+            (start.encode('ascii'), (b'*/' if start == '/*' else start.encode('ascii')))
+            for start in config['block_comment_starts']
+        )
+    return compiled
+
+
 class MultiLanguageSemanticAnalyzer:
     """多语言代码语义分析器"""
     
@@ -19,6 +162,7 @@ class MultiLanguageSemanticAnalyzer:
     LANGUAGE_CONFIG = {
         'python': {
             'file_extensions': ['.py'],
+            'imports_at_top': True,
             'import_patterns': [
                 r'^\s*import\s+(.+)',
                 r'^\s*from\s+([^\s]+)\s+import\s+(.+)'
@@ -29,10 +173,14 @@ class MultiLanguageSemanticAnalyzer:
             'class_patterns': [
                 r'class\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*[\(:]'
             ],
-            'comment_patterns': [r'#.*$', r'""".*?"""', r"'''.*?'''"]
+            'function_keywords': ('def',),
+            'class_keywords': ('class',),
+            'line_comment_prefixes': ('#',),
+            'block_comment_starts': ('"""', "'''")
         },
         'javascript': {
             'file_extensions': ['.js', '.jsx', '.ts', '.tsx'],
+            'imports_at_top': True,
             'import_patterns': [
                 r'^\s*import\s+(.+?)\s+from\s+["\']([^"\']+)["\']',
                 r'^\s*import\s+["\']([^"\']+)["\']',
@@ -48,10 +196,14 @@ class MultiLanguageSemanticAnalyzer:
             'class_patterns': [
                 r'class\s+([a-zA-Z_$][a-zA-Z0-9_$]*)\s*[{(]'
             ],
-            'comment_patterns': [r'//.*$', r'/\*.*?\*/']
+            'function_keywords': ('function', 'const', '=>'),
+            'class_keywords': ('class',),
+            'line_comment_prefixes': ('//',),
+            'block_comment_starts': ('/*',)
         },
         'java': {
             'file_extensions': ['.java'],
+            'imports_at_top': True,
             'import_patterns': [
                 r'^\s*import\s+(?:static\s+)?([^;]+);'
             ],
@@ -61,10 +213,14 @@ class MultiLanguageSemanticAnalyzer:
             'class_patterns': [
                 r'(?:public|private|protected|abstract|final|\s)*\s*class\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*[{<]'
             ],
-            'comment_patterns': [r'//.*$', r'/\*.*?\*/']
+            'function_keywords': ('(',),
+            'class_keywords': ('class',),
+            'line_comment_prefixes': ('//',),
+            'block_comment_starts': ('/*',)
         },
         'golang': {
             'file_extensions': ['.go'],
+            'imports_at_top': True,
             'import_patterns': [
                 r'^\s*import\s+"([^"]+)"',
                 r'^\s*import\s+([a-zA-Z_][a-zA-Z0-9_]*)\s+"([^"]+)"',
@@ -77,10 +233,14 @@ class MultiLanguageSemanticAnalyzer:
             'class_patterns': [
                 r'type\s+([a-zA-Z_][a-zA-Z0-9_]*)\s+struct\s*{'
             ],
-            'comment_patterns': [r'//.*$', r'/\*.*?\*/']
+            'function_keywords': ('func',),
+            'class_keywords': ('struct',),
+            'line_comment_prefixes': ('//',),
+            'block_comment_starts': ('/*',)
         },
         'cpp': {
             'file_extensions': ['.cpp', '.cc', '.cxx', '.c++', '.hpp', '.h'],
+            'imports_at_top': False,
             'import_patterns': [
                 r'^\s*#include\s*<([^>]+)>',
                 r'^\s*#include\s*"([^"]+)"',
@@ -94,10 +254,14 @@ class MultiLanguageSemanticAnalyzer:
                 r'class\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*[{:]',
                 r'struct\s+([a-zA-Z_][a-zA-Z0-9_]*)\s*[{:]'
             ],
-            'comment_patterns': [r'//.*$', r'/\*.*?\*/']
+            'function_keywords': ('(',),
+            'class_keywords': ('class', 'struct'),
+            'line_comment_prefixes': ('//',),
+            'block_comment_starts': ('/*',)
         },
         'typescript': {
             'file_extensions': ['.ts', '.tsx'],
+            'imports_at_top': True,
             'import_patterns': [
                 r'^\s*import\s+(.+?)\s+from\s+["\']([^"\']+)["\']',
                 r'^\s*import\s+["\']([^"\']+)["\']',
@@ -113,203 +277,351 @@ class MultiLanguageSemanticAnalyzer:
                 r'class\s+([a-zA-Z_$][a-zA-Z0-9_$]*)\s*[{<]',
                 r'interface\s+([a-zA-Z_$][a-zA-Z0-9_$]*)\s*[{<]'
             ],
-            'comment_patterns': [r'//.*$', r'/\*.*?\*/']
+            'function_keywords': ('function', 'const', '=>'),
+            'class_keywords': ('class', 'interface'),
+            'line_comment_prefixes': ('//',),
+            'block_comment_starts': ('/*',)
         }
     }
     
+    # 预编译的正则（与 LANGUAGE_CONFIG 结构一致），避免在热路径上重复编译
+    COMPILED_LANGUAGE_CONFIG = _compile_language_config(LANGUAGE_CONFIG)
+    
+    # imports_at_top 的语言中，连续这么多行代码都不是导入语句即认为导入区已结束
+    IMPORT_REGION_MAX_GAP = 50
+    
+    # 扩展名 -> 语言 的扁平映射；同一扩展名出现在多个语言中时保留先出现的（与逐个语言查找的结果一致）
+    _EXT_TO_LANG = {}
+    for _language, _config in LANGUAGE_CONFIG.items():
+        for _ext in _config['file_extensions']:
+            _EXT_TO_LANG.setdefault(_ext, _language)
+    del _language, _config, _ext
+    
     @staticmethod
     def get_language_from_file(file_path: str) -> Optional[str]:
         """根据文件扩展名判断编程语言"""
-        ext = Path(file_path).suffix.lower()
-        
-        for language, config in MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG.items():
-            if ext in config['file_extensions']:
-                return language
-        return None
+        # 与 Path(file_path).suffix 规则一致（取最后一段路径，忽略以点开头的隐藏文件名），
+        # 但只做字符串切分，不构造 Path 对象
+        file_name = file_path.rpartition('/')[2]
+        stem, _, ext = file_name.rpartition('.')
+        if not stem:
+            return None
+        return MultiLanguageSemanticAnalyzer._EXT_TO_LANG.get('.' + ext.lower())
     
     @staticmethod
-    def extract_imports(file_content: str, language: str) -> List[Dict[str, Any]]:
-        """提取指定语言的导入语句"""
+    def extract_imports(file_content: Union[str, bytes], language: str) -> List[Dict[str, Any]]:
+        """
+        提取指定语言的导入语句
+        
+        file_content 可以是原始字节（推荐，直接按字节扫描，仅对命中的行解码）或已解码的字符串
+        """
         if language not in MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG:
             return []
         
-        config = MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG[language]
+        if isinstance(file_content, str):
+            file_content = file_content.encode('utf-8')
+        
+        # Python 优先用 ast 解析，语法错误（如 Python 2 代码）时回退到正则
+        if language == 'python':
+            imports = MultiLanguageSemanticAnalyzer._extract_python_imports_ast(file_content)
+            if imports is not None:
+                return imports
+        
+        language_config = MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG[language]
+        config = MultiLanguageSemanticAnalyzer.COMPILED_LANGUAGE_CONFIG[language]
+        first_chars = config['import_first_chars_bytes']
+        comment_prefixes = config['comment_prefixes_bytes']
+        imports_re = config['imports_bytes_re']
+        block_comment_pairs = config['block_comment_pairs_bytes']
+        max_gap = MultiLanguageSemanticAnalyzer.IMPORT_REGION_MAX_GAP if language_config['imports_at_top'] else None
+        lines_since_import = 0
+        # 当前所在块注释的结束符，不在块注释中时为 None；块注释内的行（如许可证头）不计入 max_gap
+        block_comment_end = None
         imports = []
-        lines = file_content.split('\n')
         
-        for line_num, line in enumerate(lines, 1):
+        # 逐行流式读取，导入区结束后可以提前退出，不必切分整个文件
+        for line_num, line in enumerate(io.BytesIO(file_content), 1):
             stripped = line.strip()
             
             # 跳过空行和注释
             if not stripped:
                 continue
             
-            # 检查是否是注释
-            is_comment = False
-            for comment_pattern in config['comment_patterns']:
-                if re.search(comment_pattern, stripped):
-                    is_comment = True
-                    break
+            in_block_comment = block_comment_end is not None
+            if in_block_comment:
+                if block_comment_end in stripped:
+                    block_comment_end = None
             
-            if is_comment:
+            # 检查是否是注释（注释起始符都是固定前缀，用 startswith 即可）
+            if stripped.startswith(comment_prefixes):
+                if not in_block_comment:
+                    for start, end in block_comment_pairs:
+                        if stripped.startswith(start) and end not in stripped[len(start):]:
+                            block_comment_end = end
+                            break
                 continue
             
-            # 匹配导入语句
-            for pattern in config['import_patterns']:
-                match = re.search(pattern, stripped)
-                if match:
-                    import_info = {
-                        'language': language,
-                        'line_number': line_num,
-                        'import_statement': stripped,
-                        'match_groups': match.groups()
-                    }
-                    
-                    # 根据语言特定处理
-                    if language == 'python':
-                        if 'from' in stripped:
-                            import_info['import_type'] = 'from_import'
-                            import_info['module_name'] = match.group(1)
-                            import_info['imported_items'] = [item.strip() for item in match.group(2).split(',')]
-                        else:
-                            import_info['import_type'] = 'import'
-                            import_info['module_name'] = match.group(1)
-                            import_info['imported_items'] = None
-                    
-                    elif language in ['javascript', 'typescript']:
-                        if 'from' in stripped:
-                            import_info['import_type'] = 'es6_import'
-                            import_info['imported_items'] = match.group(1).strip()
-                            import_info['module_name'] = match.group(2)
-                        elif 'require' in stripped:
-                            import_info['import_type'] = 'require'
-                            import_info['module_name'] = match.group(1) if len(match.groups()) == 1 else match.group(2)
-                    
-                    elif language == 'java':
-                        import_info['import_type'] = 'import'
-                        import_info['module_name'] = match.group(1)
-                    
-                    elif language == 'golang':
-                        import_info['import_type'] = 'import'
-                        import_info['module_name'] = match.group(1)
-                    
-                    elif language == 'cpp':
-                        if '<' in stripped:
-                            import_info['import_type'] = 'system_include'
-                            import_info['module_name'] = match.group(1)
-                        elif '"' in stripped:
-                            import_info['import_type'] = 'local_include'
-                            import_info['module_name'] = match.group(1)
-                        elif 'using' in stripped:
-                            import_info['import_type'] = 'using_namespace'
-                            import_info['module_name'] = match.group(1)
-                    
-                    imports.append(import_info)
-                    break
+            # 导入语句的首字符是固定的（如 Python 只能是 i/f），其余行直接跳过
+            match = None
+            if first_chars is None or stripped[:1] in first_chars:
+                # 匹配导入语句（所有导入正则合并为一次 match，行首已对齐）
+                match = imports_re.match(stripped)
+            
+            if not match:
+                if not in_block_comment:
+                    lines_since_import += 1
+                    if max_gap is not None and lines_since_import >= max_gap:
+                        break
+                continue
+            
+            lines_since_import = 0
+            start, end = config['imports_groups'][match.lastgroup]
+            # 只对命中的行解码
+            groups = tuple(
+                group.decode('utf-8', errors='ignore') if group is not None else None
+                for group in match.groups()[start:end]
+            )
+            stripped = stripped.decode('utf-8', errors='ignore')
+            import_info = {
+                'language': language,
+                'line_number': line_num,
+                'import_statement': stripped,
+                'match_groups': groups
+            }
+            
+            # 根据语言特定处理
+            if language == 'python':
+                if 'from' in stripped:
+                    import_info['import_type'] = 'from_import'
+                    import_info['module_name'] = groups[0]
+                    import_info['imported_items'] = [item.strip() for item in groups[1].split(',')]
+                else:
+                    import_info['import_type'] = 'import'
+                    import_info['module_name'] = groups[0]
+                    import_info['imported_items'] = None
+            
+            elif language in ['javascript', 'typescript']:
+                if 'from' in stripped:
+                    import_info['import_type'] = 'es6_import'
+                    import_info['imported_items'] = groups[0].strip()
+                    import_info['module_name'] = groups[1]
+                elif 'require' in stripped:
+                    import_info['import_type'] = 'require'
+                    import_info['module_name'] = groups[0] if len(groups) == 1 else groups[1]
+            
+            elif language == 'java':
+                import_info['import_type'] = 'import'
+                import_info['module_name'] = groups[0]
+            
+            elif language == 'golang':
+                import_info['import_type'] = 'import'
+                import_info['module_name'] = groups[0]
+            
+            elif language == 'cpp':
+                if '<' in stripped:
+                    import_info['import_type'] = 'system_include'
+                    import_info['module_name'] = groups[0]
+                elif '"' in stripped:
+                    import_info['import_type'] = 'local_include'
+                    import_info['module_name'] = groups[0]
+                elif 'using' in stripped:
+                    import_info['import_type'] = 'using_namespace'
+                    import_info['module_name'] = groups[0]
+            
+            imports.append(import_info)
         
         return imports
     
     @staticmethod
-    def detect_function_changes(patch_content: str, language: str) -> List[Dict[str, Any]]:
-        """检测函数变更（多语言支持）"""
-        if language not in MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG:
+    def _extract_python_imports_ast(file_content: bytes) -> Optional[List[Dict[str, Any]]]:
+        """用 ast 提取 Python 导入语句，正确处理多行的 from x import (a, b)；无法解析时返回 None"""
+        try:
+            tree = ast.parse(file_content)
+        except (SyntaxError, ValueError, MemoryError, RecursionError):
+            # 嵌套过深的输入会让解析器抛出 MemoryError/RecursionError，与无法解析的文件一样回退到正则
+            return None
+        
+        nodes = [node for node in ast.walk(tree) if isinstance(node, (ast.Import, ast.ImportFrom))]
+        if not nodes:
             return []
         
-        config = MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG[language]
-        functions = []
-        hunks = MultiLanguageSemanticAnalyzer.parse_diff_hunks(patch_content)
+        nodes.sort(key=lambda node: (node.lineno, node.col_offset))
+        lines = _LINE_BREAK_BYTES_RE.split(file_content)
+        imports = []
         
-        for hunk in hunks:
-            # 检查hunk的context信息
-            context = hunk.get('context', '')
-            for pattern in config['function_patterns']:
-                match = re.search(pattern, context)
-                if match:
-                    functions.append({
-                        'function_name': match.group(1),
-                        'change_type': 'modified',
-                        'line_content': context.strip(),
-                        'source': 'context',
-                        'language': language
-                    })
+        for node in nodes:
+            statement = b'\n'.join(lines[node.lineno - 1:node.end_lineno]).strip().decode('utf-8', errors='ignore')
+            items = [f"{alias.name} as {alias.asname}" if alias.asname else alias.name for alias in node.names]
             
-            # 检查变更内容中的函数定义
-            for change_line in hunk['changes']:
-                if change_line.startswith(('+', '-')):
-                    for pattern in config['function_patterns']:
-                        match = re.search(pattern, change_line)
-                        if match:
-                            change_type = 'added' if change_line.startswith('+') else 'removed'
-                            functions.append({
-                                'function_name': match.group(1),
-                                'change_type': change_type,
-                                'line_content': change_line[1:].strip(),
-                                'source': 'diff_content',
-                                'language': language
-                            })
-        
-        # 去重
-        unique_functions = {}
-        for func in functions:
-            key = f"{func['function_name']}_{func['language']}"
-            if key not in unique_functions:
-                unique_functions[key] = func
+            if isinstance(node, ast.ImportFrom):
+                module_name = '.' * node.level + (node.module or '')
+                import_info = {
+                    'language': 'python',
+                    'line_number': node.lineno,
+                    'import_statement': statement,
+                    'match_groups': (module_name, ', '.join(items)),
+                    'import_type': 'from_import',
+                    'module_name': module_name,
+                    'imported_items': items
+                }
             else:
-                if func['source'] == 'diff_content':
-                    unique_functions[key] = func
+                module_name = ', '.join(items)
+                import_info = {
+                    'language': 'python',
+                    'line_number': node.lineno,
+                    'import_statement': statement,
+                    'match_groups': (module_name,),
+                    'import_type': 'import',
+                    'module_name': module_name,
+                    'imported_items': None
+                }
+            imports.append(import_info)
         
-        return list(unique_functions.values())
+        return imports
     
     @staticmethod
-    def detect_class_changes(patch_content: str, language: str) -> List[Dict[str, Any]]:
-        """检测类变更（多语言支持）"""
+    def analyze_patch(patch_content: str, language: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        一次扫描 diff，同时切分 hunks 并检测函数和类变更（多语言支持）
+        
+        Returns:
+            {'functions': [...], 'classes': [...], 'hunks': [...]}，hunks 与 parse_diff_hunks 的结果相同
+        """
         if language not in MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG:
-            return []
+            return {
+                'functions': [],
+                'classes': [],
+                'hunks': MultiLanguageSemanticAnalyzer.parse_diff_hunks(patch_content)
+            }
         
-        config = MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG[language]
-        classes = []
-        hunks = MultiLanguageSemanticAnalyzer.parse_diff_hunks(patch_content)
+        config = MultiLanguageSemanticAnalyzer.COMPILED_LANGUAGE_CONFIG[language]
+        language_config = MultiLanguageSemanticAnalyzer.LANGUAGE_CONFIG[language]
+        categories = [
+            ('functions', 'function_name', language_config['function_keywords'],
+             config['functions_re'], config['function_patterns']),
+            ('classes', 'class_name', language_config['class_keywords'],
+             config['classes_re'], config['class_patterns'])
+        ]
+        results = {'functions': [], 'classes': []}
+        hunks = []
+        current_hunk = None
         
-        for hunk in hunks:
-            # 检查hunk的context信息
-            context = hunk.get('context', '')
-            for pattern in config['class_patterns']:
-                match = re.search(pattern, context)
-                if match:
-                    classes.append({
-                        'class_name': match.group(1),
-                        'change_type': 'modified',
-                        'line_content': context.strip(),
-                        'source': 'context',
+        for line_match in _DIFF_LINE_RE.finditer(patch_content):
+            line = line_match.group()
+            if line.startswith('@@'):
+                header_match = _HUNK_HEADER_RE.match(line)
+                if not header_match:
+                    continue
+                current_hunk = MultiLanguageSemanticAnalyzer._new_hunk(header_match)
+                hunks.append(current_hunk)
+                
+                # 检查hunk的context信息
+                context = current_hunk['context']
+                if not context:
+                    continue
+                for category, name_key, keywords, combined_re, patterns in categories:
+                    # 先用必含的字面关键字预筛，再用合并正则做一次快速筛选
+                    if not any(keyword in context for keyword in keywords):
+                        continue
+                    combined_match = combined_re.search(context)
+                    if not combined_match:
+                        continue
+                    for name in MultiLanguageSemanticAnalyzer._matched_names(combined_match, context, patterns):
+                        results[category].append({
+                            name_key: name,
+                            'change_type': 'modified',
+                            'line_content': context,
+                            'source': 'context',
+                            'language': language
+                        })
+                continue
+            
+            if not current_hunk or line[0] == '@':
+                continue
+            current_hunk['changes'].append(line)
+            
+            # 检查变更内容中的函数/类定义（上下文行跳过）
+            marker = line[0]
+            if marker == ' ':
+                continue
+            change_type = 'added' if marker == '+' else 'removed'
+            for category, name_key, keywords, combined_re, patterns in categories:
+                if not any(keyword in line for keyword in keywords):
+                    continue
+                combined_match = combined_re.search(line)
+                if not combined_match:
+                    continue
+                for name in MultiLanguageSemanticAnalyzer._matched_names(combined_match, line, patterns):
+                    results[category].append({
+                        name_key: name,
+                        'change_type': change_type,
+                        'line_content': line[1:].strip(),
+                        'source': 'diff_content',
                         'language': language
                     })
-            
-            # 检查变更内容中的类定义
-            for change_line in hunk['changes']:
-                if change_line.startswith(('+', '-')):
-                    for pattern in config['class_patterns']:
-                        match = re.search(pattern, change_line)
-                        if match:
-                            change_type = 'added' if change_line.startswith('+') else 'removed'
-                            classes.append({
-                                'class_name': match.group(1),
-                                'change_type': change_type,
-                                'line_content': change_line[1:].strip(),
-                                'source': 'diff_content',
-                                'language': language
-                            })
-        
-        # 去重
-        unique_classes = {}
-        for cls in classes:
-            key = f"{cls['class_name']}_{cls['language']}"
-            if key not in unique_classes:
-                unique_classes[key] = cls
-            else:
-                if cls['source'] == 'diff_content':
-                    unique_classes[key] = cls
         
-        return list(unique_classes.values())
+        results['functions'] = MultiLanguageSemanticAnalyzer._dedupe_changes(results['functions'], 'function_name')
+        results['classes'] = MultiLanguageSemanticAnalyzer._dedupe_changes(results['classes'], 'class_name')
+        results['hunks'] = hunks
+        return results
+    
+    @staticmethod
+    def _matched_names(combined_match: re.Match, line: str, patterns: List[re.Pattern]) -> List[str]:
+        """
+        返回该类别中每个命中正则提取到的名称（按正则顺序，与逐个 search 的结果一致）
+        
+        类别只有一个正则时，合并正则的命中就是最终结果，直接从中取名称，不再重复扫描；
+        有多个正则时每个正则都可能命中，仍需逐个 search
+        """
+        if len(patterns) == 1:
+            # 合并正则形如 (?P<p0>...)，原正则的第 1 个分组是整体的第 2 个分组
+            return [combined_match.group(2)]
+        names = []
+        for pattern in patterns:
+            match = pattern.search(line)
+            if match:
+                names.append(match.group(1))
+        return names
+    
+    @staticmethod
+    def _dedupe_changes(changes: List[Dict[str, Any]], name_key: str) -> List[Dict[str, Any]]:
+        """按名称去重，保留首次出现的记录和顺序，之后出现的 diff_content 来源记录覆盖之前的记录"""
+        unique_changes = {}
+        for change in changes:
+            key = f"{change[name_key]}_{change['language']}"
+            # 覆盖已有的键不改变它在字典中的位置，输出顺序仍按名称首次出现的顺序
+            if key not in unique_changes or change['source'] == 'diff_content':
+                unique_changes[key] = change
+        
+        return list(unique_changes.values())
+    
+    @staticmethod
+    def detect_function_changes(patch_content: str, language: str) -> List[Dict[str, Any]]:
+        """检测函数变更（多语言支持）"""
+        return MultiLanguageSemanticAnalyzer.analyze_patch(patch_content, language)['functions']
+    
+    @staticmethod
+    def detect_class_changes(patch_content: str, language: str) -> List[Dict[str, Any]]:
+        """检测类变更（多语言支持）"""
+        return MultiLanguageSemanticAnalyzer.analyze_patch(patch_content, language)['classes']
+    
+    @staticmethod
+    def reconstruct_new_content(hunks: List[Dict[str, Any]]) -> str:
+        """由 diff hunks 还原新版本的文件内容（上下文行和新增行）；只有 patch 覆盖整个文件时才是完整内容"""
+        return '\n'.join(line[1:] for hunk in hunks for line in hunk['changes'] if line[0] != '-')
+    
+    @staticmethod
+    def _new_hunk(header_match: re.Match) -> Dict[str, Any]:
+        """由 hunk 头的匹配结果创建 hunk 记录"""
+        context = header_match.group(5) or ''
+        return {
+            'old_start': int(header_match.group(1)),
+            'old_count': int(header_match.group(2) or 1),
+            'new_start': int(header_match.group(3)),
+            'new_count': int(header_match.group(4) or 1),
+            'context': context.strip(),
+            'changes': []
+        }
     
     @staticmethod
     def parse_diff_hunks(patch_content: str) -> List[Dict[str, Any]]:
@@ -317,34 +629,286 @@ class MultiLanguageSemanticAnalyzer:
         hunks = []
         current_hunk = None
         
-        for line in patch_content.split('\n'):
+        # 一次扫描只取出以 @、+、-、空格开头的行，其余行（如 "\ No newline at end of file"）不会生成字符串
+        for line_match in _DIFF_LINE_RE.finditer(patch_content):
+            line = line_match.group()
             if line.startswith('@@'):
-                match = re.match(r'@@ -(\d+),?(\d+)? \+(\d+),?(\d+)? @@(.+)?', line)
+                match = _HUNK_HEADER_RE.match(line)
                 if match:
-                    old_start = int(match.group(1))
-                    old_count = int(match.group(2) or 1)
-                    new_start = int(match.group(3))
-                    new_count = int(match.group(4) or 1)
-                    context = match.group(5) or ''
-                    
-                    current_hunk = {
-                        'old_start': old_start,
-                        'old_count': old_count,
-                        'new_start': new_start,
-                        'new_count': new_count,
-                        'context': context.strip(),
-                        'changes': []
-                    }
+                    current_hunk = MultiLanguageSemanticAnalyzer._new_hunk(match)
                     hunks.append(current_hunk)
             
-            elif current_hunk and line.startswith(('+', '-', ' ')):
+            elif current_hunk and line[0] != '@':
                 current_hunk['changes'].append(line)
         
         return hunks
 
+# 一次 GraphQL 请求取回 PR 的 commits、files、reviews 和 review comments
+PR_BUNDLE_QUERY = """
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      commits(first: 100) {
+        pageInfo { hasNextPage }
+        nodes { commit { oid message author { name email } committer { date } } }
+      }
+      files(first: 100) {
+        pageInfo { hasNextPage }
+        nodes { path additions deletions }
+      }
+      reviews(first: 100) {
+        pageInfo { hasNextPage }
+        nodes { author { login } body state submittedAt }
+      }
+      reviewThreads(first: 100) {
+        pageInfo { hasNextPage }
+        nodes {
+          comments(first: 100) {
+            pageInfo { hasNextPage }
+            nodes { author { login } body path line createdAt }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# process_pr_data 内层循环（每个文件、每个函数/类/hunk/导入）产生的记录类型。
+# 用带 __slots__ 的 dataclass 代替 dict：按位置构造、不建哈希表；orjson 原生序列化 dataclass，
+# 字段顺序即 JSONL 中的键顺序
+@dataclass(slots=True)
+class FileChangeRecord:
+    repo_full_name: str
+    pr_number: int
+    commit_hash: str
+    file_path: str
+    file_language: Optional[str]
+    change_type: str
+    additions: int
+    deletions: int
+    changes: int
+    patch_content: str
+
+
+@dataclass(slots=True)
+class FunctionChangeRecord:
+    repo_full_name: str
+    pr_number: int
+    commit_hash: str
+    file_path: str
+    file_language: str
+    function_name: str
+    change_type: str
+    line_content: str
+    source: str
+
+
+@dataclass(slots=True)
+class ClassChangeRecord:
+    repo_full_name: str
+    pr_number: int
+    commit_hash: str
+    file_path: str
+    file_language: str
+    class_name: str
+    change_type: str
+    line_content: str
+    source: str
+
+
+@dataclass(slots=True)
+class DiffHunkRecord:
+    repo_full_name: str
+    pr_number: int
+    commit_hash: str
+    file_path: str
+    file_language: str
+    hunk_index: int
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    context: str
+    content: str
+
+
+@dataclass(slots=True)
+class ImportRecord:
+    repo_full_name: str
+    pr_number: int
+    commit_hash: str
+    file_path: str
+    file_language: str
+    import_statement: str
+    import_type: str
+    module_name: Optional[str]
+    imported_items: Any
+    line_number: int
+
+
+class RateLimiter:
+    """线程安全的令牌桶限速器，多个工作线程共享同一份请求速率"""
+    
+    def __init__(self, rate: float, capacity: int):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量，即允许的最大突发请求数
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        """取走一个令牌，桶空时阻塞到有令牌可用"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            time.sleep(wait_time)
+    
+    def set_rate(self, rate: float) -> None:
+        """调整令牌补充速率（已积累的令牌按旧速率结算）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+            self._last_refill = now
+            self.rate = rate
+
+
+class ResponseCache:
+    """
+    基于 SQLite 的 GitHub API 响应磁盘缓存（多线程共享一个连接，由锁保护）
+    
+    以 commit SHA 定位的资源（commit 详情、某次提交时的文件内容）不会再变化，直接复用；
+    会变化的接口（如 PR 列表）保存 ETag，下次用 If-None-Match 做条件请求重新验证
+    """
+    
+    # 攒够这么多条写入才提交一次，避免 I/O 线程池在每条响应的提交上排队
+    COMMIT_INTERVAL = 100
+    
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending_writes = 0
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        # 缓存丢失只意味着重新请求，不需要每次提交都 fsync
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                cache_key TEXT PRIMARY KEY,
+                etag TEXT,
+                body BLOB NOT NULL
+            )
+        ''')
+        self.conn.commit()
+    
+    def get(self, cache_key: str) -> Optional[Tuple[Optional[str], bytes]]:
+        """返回 (etag, body)，未命中时返回 None"""
+        with self._lock:
+            row = self.conn.execute(
+                'SELECT etag, body FROM responses WHERE cache_key = ?', (cache_key,)
+            ).fetchone()
+        return row
+    
+    def set(self, cache_key: str, body: bytes, etag: Optional[str] = None) -> None:
+        """写入或覆盖一条缓存"""
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (cache_key, etag, body) VALUES (?, ?, ?)',
+                (cache_key, etag, body)
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= self.COMMIT_INTERVAL:
+                self.conn.commit()
+                self._pending_writes = 0
+    
+    def flush(self) -> None:
+        """提交尚未提交的缓存写入；连接已关闭时什么也不做"""
+        with self._lock:
+            if self.conn is not None and self._pending_writes:
+                self.conn.commit()
+                self._pending_writes = 0
+    
+    def close(self) -> None:
+        """提交剩余写入并关闭连接（可重复调用）"""
+        self.flush()
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+
+class RecordBatcher:
+    """按输出文件把一个 PR 的记录在处理线程中序列化进 bytearray，PR 处理结束时每个文件只交给写线程一次、一次 write 写入"""
+    
+    def __init__(self, crawler: 'MultiLanguageGitHubPRCrawler', max_bytes: int):
+        self.crawler = crawler
+        # 超大 PR 的兜底：单个文件缓冲超过该字节数时提前交给写线程，避免占用过多内存
+        self.max_bytes = max_bytes
+        self._buffers: Dict[Path, bytearray] = {}
+    
+    def add(self, data: Any, file_path: Path) -> None:
+        buffer = self._buffers.get(file_path)
+        if buffer is None:
+            buffer = self._buffers[file_path] = bytearray()
+        buffer += self.crawler.encode_record(data, file_path)
+        if len(buffer) >= self.max_bytes:
+            self.crawler.save_lines_to_jsonl(buffer, file_path)
+            self._buffers[file_path] = bytearray()
+    
+    def flush(self) -> None:
+        for file_path, buffer in self._buffers.items():
+            if buffer:
+                self.crawler.save_lines_to_jsonl(buffer, file_path)
+        self._buffers.clear()
+
+
 class MultiLanguageGitHubPRCrawler:
+    # 剩余 API 额度低于该值时开始按重置时间均匀放慢请求（调低 rate_limiter 的速率）
+    RATE_LIMIT_PACING_THRESHOLD = 500
+    
+    # JSONL 输出文件的写缓冲大小
+    JSONL_BUFFER_SIZE = 1 << 20
+    
+    # compress_output 开启时的 zstd 压缩级别
+    ZSTD_LEVEL = 3
+    
+    # 待写入记录队列的最大长度（每项是一个文件的若干行已序列化记录）
+    WRITE_QUEUE_SIZE = 10000
+    
+    # 处理 PR 时单个输出文件的缓冲上限（字节），正常情况下每个 PR 每个文件只写一次
+    RECORD_BATCH_BYTES = 8 << 20
+    
+    # 不做语义分析的文件：依赖/构建目录、压缩或生成的文件，以及改动行数过多的文件
+    SKIP_ANALYSIS_DIRS = ('vendor/', 'third_party/', 'node_modules/', 'dist/', 'build/')
+    SKIP_ANALYSIS_SUFFIXES = ('.min.js', '.lock', '.map', '.pb.go', '_pb2.py')
+    MAX_ANALYZED_CHANGES = 5000
+    MAX_ANALYZED_PATCH_SIZE = 200_000
+    
+    # 输出的记录类型，对应 {language}_{记录类型}.jsonl
+    OUTPUT_RECORD_TYPES = (
+        'pr_data', 'review_comments', 'commits', 'file_changes',
+        'function_changes', 'class_changes', 'diff_hunks', 'imports'
+    )
+    
+    # 并发处理 PR 的线程数，以及所有线程共享的请求速率（每秒请求数 / 最大突发数）
+    PR_WORKERS = 8
+    REQUESTS_PER_SECOND = 10
+    REQUEST_BURST = 20
+    
     def __init__(self, token: str, repos_dir: str = "top_2000_star_repos_this_year", 
-                 output_dir: str = "github_pr_data"):
+                 output_dir: str = "github_pr_data", max_concurrency: int = 32,
+                 merge_output: bool = False, compress_output: bool = False):
         """
         初始化多语言 GitHub PR 爬虫
         
@@ -352,6 +916,10 @@ class MultiLanguageGitHubPRCrawler:
             token: GitHub Personal Access Token
             repos_dir: 存放仓库列表JSONL文件的目录
             output_dir: 输出数据的目录
+            max_concurrency: 同时在途的 API 请求上限（请求线程池和 HTTP 连接池的大小）
+            merge_output: 为 True 时每种语言的所有记录写入同一个 {language}.jsonl，
+                          以 "_type" 字段区分记录类型
+            compress_output: 为 True 时输出写为 zstd 压缩的 .jsonl.zst（需要安装 zstandard）
         """
         self.token = token
         self.headers = {
@@ -360,18 +928,68 @@ class MultiLanguageGitHubPRCrawler:
             'User-Agent': 'GitHub-PR-Crawler'
         }
         self.base_url = 'https://api.github.com'
+        self.graphql_url = f'{self.base_url}/graphql'
+        
+        # 复用同一个 Session，保持 HTTP keep-alive，避免每次请求都重新握手
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        # 网关错误和连接错误在连接池层面带指数退避自动重试（不包括 403 限流，由 make_request 处理）
+        retry = Retry(
+            total=5,
+            backoff_factor=0.5,
+            status_forcelist=[502, 503, 504],
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency, max_retries=retry)
+        self.session.mount('https://', adapter)
         self.repos_dir = Path(repos_dir)
         self.output_dir = Path(output_dir)
         
         # 创建输出目录
         self.output_dir.mkdir(exist_ok=True)
         
+        # API 响应磁盘缓存，重新运行时不必再次请求不可变的资源
+        self.cache = ResponseCache(self.output_dir / 'api_cache.sqlite')
+        
+        # 已打开的 JSONL 输出文件句柄（二进制追加，1 MiB 缓冲），退出时统一关闭。
+        # 记录经写队列交给后台写线程写入，抓取线程不会阻塞在磁盘 I/O 上；
+        # 队列有上限，写线程跟不上时生产者会被阻塞而不是无限占用内存
+        self._jsonl_handles: Dict[Path, io.BufferedWriter] = {}
+        self.merge_output = merge_output
+        if compress_output and zstandard is None:
+            logger.warning("zstandard is not installed, writing uncompressed JSONL")
+            compress_output = False
+        self.compress_output = compress_output
+        # 合并输出时 按类型的路径 -> (合并文件路径, "_type" 前缀)
+        self._merged_targets: Dict[Path, Tuple[Path, bytes]] = {}
+        self._write_lock = threading.Lock()
+        self._write_queue: queue.Queue = queue.Queue(maxsize=self.WRITE_QUEUE_SIZE)
+        self._writer_thread = threading.Thread(target=self._writer_loop, name='jsonl-writer', daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.close_all)
+        
         # 初始化多语言语义分析器
         self.analyzer = MultiLanguageSemanticAnalyzer()
         
-        # API 调用计数和限制
+        # API 调用计数和限制（多线程并发请求时由锁保护）
         self.api_calls = 0
         self.rate_limit_remaining = 5000
+        self.rate_limit_reset = 0
+        self._api_lock = threading.Lock()
+        
+        self.rate_limiter = RateLimiter(self.REQUESTS_PER_SECOND, self.REQUEST_BURST)
+        
+        # GraphQL 的额度独立于 REST；请求失败（非 200 或返回 errors）后不再尝试，之后的 PR 直接走 REST
+        self.graphql_enabled = True
+        self.graphql_rate_limit_remaining = 5000
+        self.graphql_rate_limit_reset = 0
+        
+        # 用于并发发出 API 请求：PR 的各个子资源（commits/files/reviews/comments）、
+        # 各 commit 的详情以及文件内容，所有 PR 线程共享，与连接池大小一致
+        self.io_pool = ThreadPoolExecutor(max_workers=max_concurrency)
+        
+        # 用于并发处理同一仓库的多个 PR
+        self.pr_pool = ThreadPoolExecutor(max_workers=self.PR_WORKERS)
         
         # 统计信息
         self.stats = {
@@ -385,43 +1003,110 @@ class MultiLanguageGitHubPRCrawler:
             'functions_detected': 0,
             'classes_detected': 0,
             'imports_extracted': 0,
-            'language_stats': {}
+            'language_stats': Counter()
         }
+        self._stats_lock = threading.Lock()
+    
+    def _add_stat(self, key: str, amount: int = 1) -> None:
+        """线程安全地累加统计计数"""
+        with self._stats_lock:
+            self.stats[key] += amount
     
     def check_rate_limit(self) -> None:
-        """检查并处理 API 速率限制"""
-        if self.rate_limit_remaining < 50:
-            logger.warning(f"API rate limit low: {self.rate_limit_remaining}, waiting...")
-            time.sleep(60)
+        """额度已用完时等待到重置时刻；额度不足时的放慢由 _update_request_rate 调整 rate_limiter 完成"""
+        if self.rate_limit_remaining > 0:
+            return
+        
+        seconds_to_reset = self.rate_limit_reset - time.time()
+        wait_time = seconds_to_reset + 1 if seconds_to_reset > 0 else 60
+        logger.warning(f"API rate limit exhausted, waiting {wait_time:.0f}s...")
+        time.sleep(wait_time)
+    
+    def _update_request_rate(self) -> None:
+        """
+        根据 X-RateLimit-Remaining / X-RateLimit-Reset 调整所有线程共享的请求速率
+        
+        剩余额度充足时按 REQUESTS_PER_SECOND 发送；低于 RATE_LIMIT_PACING_THRESHOLD 后，
+        速率降为 剩余次数 / 距重置的秒数，让额度恰好用到重置时刻
+        """
+        remaining = self.rate_limit_remaining
+        seconds_to_reset = self.rate_limit_reset - time.time()
+        rate = self.REQUESTS_PER_SECOND
+        if remaining < self.RATE_LIMIT_PACING_THRESHOLD and seconds_to_reset > 0:
+            rate = min(rate, max(remaining, 1) / seconds_to_reset)
+        if rate != self.rate_limiter.rate:
+            self.rate_limiter.set_rate(rate)
     
-    def make_request(self, url: str, params: Dict = None, max_retries: int = 3) -> Optional[Dict]:
-        """发送 API 请求并处理响应"""
+    def _rate_limit_wait_time(self, response: requests.Response) -> Optional[float]:
+        """
+        403 响应是限流导致时返回应等待的秒数，否则（如无权访问）返回 None
+        
+        次级限流带 Retry-After；主限流额度用完时等到 X-RateLimit-Reset；
+        次级限流未给出 Retry-After 时按 GitHub 文档至少等待一分钟
+        """
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            return float(retry_after)
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            return max(self.rate_limit_reset - time.time(), 0) + 1
+        if 'rate limit' in response.text.lower():
+            return 60
+        return None
+    
+    def make_request(self, url: str, params: Dict = None, max_retries: int = 3,
+                     revalidate: bool = False) -> Optional[Dict]:
+        """
+        发送 API 请求并处理响应
+        
+        Args:
+            revalidate: 为 True 时缓存响应的 ETag，下次以条件请求重新验证，
+                        未变化（304）时直接返回缓存内容
+        """
+        cache_key = None
+        cached = None
+        headers = None
+        if revalidate:
+            cache_key = f"etag:{url}?{urlencode(sorted((params or {}).items()))}"
+            cached = self.cache.get(cache_key)
+            if cached and cached[0]:
+                headers = {'If-None-Match': cached[0]}
+        
         for attempt in range(max_retries):
             self.check_rate_limit()
+            self.rate_limiter.acquire()
             
             try:
-                response = requests.get(url, headers=self.headers, params=params, timeout=30)
-                self.api_calls += 1
+                response = self.session.get(url, params=params, headers=headers, timeout=30)
                 
-                self.rate_limit_remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-                rate_limit_reset = response.headers.get('X-RateLimit-Reset', 0)
+                with self._api_lock:
+                    self.api_calls += 1
+                    # 部分错误响应不带限流头，此时保留上一次的值
+                    if 'X-RateLimit-Remaining' in response.headers:
+                        self.rate_limit_remaining = int(response.headers['X-RateLimit-Remaining'])
+                    if 'X-RateLimit-Reset' in response.headers:
+                        self.rate_limit_reset = int(response.headers['X-RateLimit-Reset'])
+                self._update_request_rate()
                 
                 if response.status_code == 200:
+                    etag = response.headers.get('ETag')
+                    if revalidate and etag:
+                        self.cache.set(cache_key, response.content, etag)
                     return response.json()
+                elif response.status_code == 304 and cached:
+                    return _loads(cached[1])
                 elif response.status_code == 403:
-                    logger.error("Rate limit exceeded, waiting...")
-                    reset_time = int(rate_limit_reset) - int(time.time())
-                    wait_time = max(reset_time, 3600)
+                    wait_time = self._rate_limit_wait_time(response)
+                    if wait_time is None:
+                        logger.error(f"Access forbidden: {url} - {response.text}")
+                        return None
+                    logger.error(f"Rate limit exceeded, waiting {wait_time:.0f}s...")
                     time.sleep(wait_time)
-                    return self.make_request(url, params, max_retries=1)
+                    return self.make_request(url, params, max_retries=1, revalidate=revalidate)
                 elif response.status_code == 404:
                     logger.warning(f"Resource not found: {url}")
                     return None
-                elif response.status_code in [502, 503, 504]:
-                    logger.warning(f"Server error {response.status_code}, retrying in {2 ** attempt} seconds...")
-                    time.sleep(2 ** attempt)
-                    continue
                 else:
+                    # 502/503/504 已由 HTTPAdapter 的 Retry 带退避重试过，到这里说明重试已用完
                     logger.error(f"API request failed: {response.status_code} - {response.text}")
                     return None
                     
@@ -459,7 +1144,7 @@ class MultiLanguageGitHubPRCrawler:
             with open(file_path, 'r', encoding='utf-8') as f:
                 for line in f:
                     if line.strip():
-                        repo_data = json.loads(line.strip())
+                        repo_data = _loads(line.strip())
                         
                         if repo_data.get('star_count', 0) >= min_stars:
                             if current_index >= start_index:
@@ -491,46 +1176,195 @@ class MultiLanguageGitHubPRCrawler:
             logger.error(f"Error loading repositories from {file_path}: {e}")
             return []
     
+    def encode_record(self, data: Any, file_path: Path) -> bytes:
+        """把一条记录序列化为一行 JSONL（bytes）；合并输出时在开头拼上 "_type" 字段"""
+        line = _dumps_line(data)
+        merged_target = self._merged_targets.get(file_path)
+        if merged_target is None:
+            return line
+        # 记录序列化结果总以 "{" 开头
+        return merged_target[1] + line[1:]
+    
     def save_to_jsonl(self, data: Dict, file_path: Path):
-        """保存数据到JSONL文件"""
+        """保存数据到JSONL文件：序列化后放入写队列即返回，由后台写线程写入"""
+        self._write_queue.put((file_path, self.encode_record(data, file_path)))
+    
+    def save_lines_to_jsonl(self, lines: Union[bytes, bytearray], file_path: Path):
+        """把已序列化好的若干行作为一个队列项交给写线程，一次写入"""
+        self._write_queue.put((file_path, lines))
+    
+    def _writer_loop(self):
+        """后台写线程：从写队列取出已序列化的行写入对应 JSONL 文件（句柄保持打开并带缓冲）"""
+        while True:
+            file_path, lines = self._write_queue.get()
+            try:
+                merged_target = self._merged_targets.get(file_path)
+                if merged_target is not None:
+                    file_path = merged_target[0]
+                with self._write_lock:
+                    handle = self._jsonl_handles.get(file_path)
+                    if handle is None:
+                        handle = self._open_output(file_path)
+                        self._jsonl_handles[file_path] = handle
+                    handle.write(lines)
+            except Exception as e:
+                logger.error(f"Error saving to {file_path}: {e}")
+            finally:
+                self._write_queue.task_done()
+    
+    def _open_output(self, file_path: Path):
+        """以追加方式打开 JSONL 输出文件；开启压缩时写入 file_path + '.zst'"""
+        if self.compress_output:
+            raw = open(file_path.with_name(file_path.name + '.zst'), 'ab')
+            return zstandard.ZstdCompressor(level=self.ZSTD_LEVEL).stream_writer(raw)
+        return open(file_path, 'ab', buffering=self.JSONL_BUFFER_SIZE)
+    
+    def flush_all(self):
+        """等待写队列清空，再把所有 JSONL 缓冲写入磁盘"""
+        self._write_queue.join()
+        with self._write_lock:
+            for file_path, handle in self._jsonl_handles.items():
+                try:
+                    if self.compress_output:
+                        # 结束当前 zstd 帧，已写出的部分即使之后进程中断也能完整解压
+                        handle.flush(zstandard.FLUSH_FRAME)
+                    else:
+                        handle.flush()
+                except Exception as e:
+                    logger.error(f"Error flushing {file_path}: {e}")
+    
+    def close_all(self):
+        """等待写队列清空后关闭所有 JSONL 文件句柄（之后再写入会重新打开），并提交 API 缓存中尚未提交的写入"""
+        self._write_queue.join()
+        self.cache.flush()
+        with self._write_lock:
+            for file_path, handle in self._jsonl_handles.items():
+                try:
+                    handle.close()
+                except Exception as e:
+                    logger.error(f"Error closing {file_path}: {e}")
+            self._jsonl_handles.clear()
+    
+    def _output_paths(self, language: str) -> Dict[str, Path]:
+        """
+        各类记录的 JSONL 输出路径 {记录类型: 路径}
+        
+        merge_output 开启时这些路径只作为键使用，写线程把它们统一写入 {language}.jsonl，
+        并在每条记录开头加上 "_type" 字段标明记录类型
+        """
+        output_paths = {}
+        for record_type in self.OUTPUT_RECORD_TYPES:
+            path = self.output_dir / f"{language}_{record_type}.jsonl"
+            if self.merge_output and path not in self._merged_targets:
+                self._merged_targets[path] = (
+                    self.output_dir / f"{language}.jsonl",
+                    f'{{"_type":"{record_type}",'.encode('utf-8')
+                )
+            output_paths[record_type] = path
+        return output_paths
+    
+    def _processed_index_path(self, language: str) -> Path:
+        """已处理仓库索引文件路径（每行一个仓库全名）"""
+        return self.output_dir / f"{language}_processed.txt"
+    
+    def _mark_processed(self, language: str, repo_full_name: str):
+        """仓库处理完成后追加到已处理索引"""
         try:
-            with open(file_path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(data, ensure_ascii=False) + '\n')
+            with open(self._processed_index_path(language), 'a', encoding='utf-8') as f:
+                f.write(repo_full_name + '\n')
         except Exception as e:
-            logger.error(f"Error saving to {file_path}: {e}")
+            logger.error(f"Error updating processed index for {repo_full_name}: {e}")
+    
+    @staticmethod
+    def _scan_compressed_repo_names(file_path: Path, processed_repos: set) -> None:
+        """分块解压 .jsonl.zst 文件（每个仓库一个压缩帧），在完整的行上提取 repo_full_name"""
+        with open(file_path, 'rb') as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+            tail = b''
+            while True:
+                chunk = reader.read(8 << 20)
+                if not chunk:
+                    break
+                # 块末尾不完整的一行留到下一块一起扫描，避免字段被切断
+                data = tail + chunk
+                cut = data.rfind(b'\n') + 1
+                tail = data[cut:]
+                for match in _REPO_FULL_NAME_RE.finditer(data, 0, cut):
+                    processed_repos.add(match.group(1).decode('utf-8'))
+            for match in _REPO_FULL_NAME_RE.finditer(tail):
+                processed_repos.add(match.group(1).decode('utf-8'))
     
     def get_processed_repos_set(self, language: str) -> set:
         """获取已处理的仓库集合"""
+        index_path = self._processed_index_path(language)
+        if index_path.exists():
+            with open(index_path, 'r', encoding='utf-8') as f:
+                processed_repos = set(f.read().splitlines())
+            processed_repos.discard('')
+            logger.info(f"Found {len(processed_repos)} already processed repos (from {index_path})")
+            return processed_repos
+        
         processed_repos = set()
         
-        # 检查各种输出文件
+        # 没有索引时扫描各种输出文件重建
         output_files = [
             self.output_dir / f"{language}_pr_data.jsonl",
             self.output_dir / f"{language}_commits.jsonl",
             self.output_dir / f"{language}_file_changes.jsonl",
             self.output_dir / f"{language}_function_changes.jsonl",
             self.output_dir / f"{language}_class_changes.jsonl",
-            self.output_dir / f"{language}_imports.jsonl"
+            self.output_dir / f"{language}_imports.jsonl",
+            self.output_dir / f"{language}.jsonl"
         ]
         
+        # 只需要 repo_full_name 一个字段，直接在原始字节上用正则提取，不做整条 JSON 解析；
+        # 用 mmap 交给正则扫描，多 GB 的文件也不必整个读入内存
         for file_path in output_files:
-            if file_path.exists():
+            if file_path.exists() and file_path.stat().st_size > 0:
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            if line.strip():
-                                data = json.loads(line.strip())
-                                repo_full_name = data.get('repo_full_name')
-                                if repo_full_name:
-                                    processed_repos.add(repo_full_name)
+                    with open(file_path, 'rb') as f:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                            for match in _REPO_FULL_NAME_RE.finditer(mapped):
+                                processed_repos.add(match.group(1).decode('utf-8'))
                 except Exception as e:
                     logger.warning(f"Error reading {file_path}: {e}")
         
+        # compress_output 写出的 .jsonl.zst 文件流式解压后扫描
+        compressed_files = [
+            file_path.with_name(file_path.name + '.zst') for file_path in output_files
+        ]
+        compressed_files = [path for path in compressed_files if path.exists() and path.stat().st_size > 0]
+        if compressed_files and zstandard is None:
+            # 扫描不完整时不写索引，否则这些仓库以后都会被重新爬取
+            logger.error(f"Cannot rebuild processed index from {compressed_files[0]}: "
+                         f"zstandard is not installed (pip install zstandard)")
+            return processed_repos
+        for file_path in compressed_files:
+            try:
+                self._scan_compressed_repo_names(file_path, processed_repos)
+            except Exception as e:
+                logger.warning(f"Error reading {file_path}: {e}")
+        
+        # 写入索引，下次启动直接读取
+        try:
+            tmp_path = index_path.with_suffix('.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for repo_full_name in sorted(processed_repos):
+                    f.write(repo_full_name + '\n')
+            os.replace(tmp_path, index_path)
+        except Exception as e:
+            logger.warning(f"Error writing processed index {index_path}: {e}")
+        
         logger.info(f"Found {len(processed_repos)} already processed repos")
         return processed_repos
     
-    def get_file_content_at_commit(self, owner: str, repo_name: str, file_path: str, commit_sha: str) -> Optional[str]:
-        """获取文件在特定commit时间点的内容"""
+    def get_file_content_at_commit(self, owner: str, repo_name: str, file_path: str, commit_sha: str) -> Optional[bytes]:
+        """获取文件在特定commit时间点的内容（返回原始字节，由 extract_imports 按字节扫描）"""
+        cache_key = f"content:{owner}/{repo_name}/{commit_sha}/{file_path}"
+        cached = self.cache.get(cache_key)
+        if cached:
+            return cached[1]
+        
         try:
             url = f"{self.base_url}/repos/{owner}/{repo_name}/contents/{file_path}"
             params = {'ref': commit_sha}
@@ -542,7 +1376,8 @@ class MultiLanguageGitHubPRCrawler:
             # GitHub API返回base64编码的内容
             if data.get('encoding') == 'base64':
                 import base64
-                content = base64.b64decode(data['content']).decode('utf-8', errors='ignore')
+                content = base64.b64decode(data['content'])
+                self.cache.set(cache_key, content)
                 return content
             
         except Exception as e:
@@ -567,7 +1402,7 @@ class MultiLanguageGitHubPRCrawler:
                 'page': page
             }
             
-            data = self.make_request(url, params)
+            data = self.make_request(url, params, revalidate=True)
             if not data:
                 break
             
@@ -597,7 +1432,6 @@ class MultiLanguageGitHubPRCrawler:
                 break
             
             page += 1
-            time.sleep(0.5)
         
         logger.info(f"Found total {len(prs)} merged PRs for {owner}/{repo}")
         return prs
@@ -621,7 +1455,6 @@ class MultiLanguageGitHubPRCrawler:
                 break
             
             page += 1
-            time.sleep(0.2)
         
         return commits
     
@@ -644,7 +1477,6 @@ class MultiLanguageGitHubPRCrawler:
                 break
             
             page += 1
-            time.sleep(0.2)
         
         return files
     
@@ -667,7 +1499,6 @@ class MultiLanguageGitHubPRCrawler:
                 break
             
             page += 1
-            time.sleep(0.2)
         
         return reviews
     
@@ -690,14 +1521,182 @@ class MultiLanguageGitHubPRCrawler:
                 break
             
             page += 1
-            time.sleep(0.2)
         
         return review_comments
     
+    def make_graphql_request(self, query: str, variables: Dict, retry_on_rate_limit: bool = True) -> Optional[Dict]:
+        """
+        发送 GraphQL 请求，返回 data 字段；失败时返回 None，由调用方回退到 REST
+        
+        GraphQL 额度用完时，到重置时刻之前都直接返回 None；次级限流时与 make_request 一样等待后重试一次；
+        其他失败说明当前 token 用不了 GraphQL，关闭 graphql_enabled，之后不再发送 GraphQL 请求
+        """
+        if not self.graphql_enabled:
+            return None
+        if self.graphql_rate_limit_remaining <= 0 and time.time() < self.graphql_rate_limit_reset:
+            return None
+        
+        try:
+            self.check_rate_limit()
+            self.rate_limiter.acquire()
+            response = self.session.post(self.graphql_url, json={'query': query, 'variables': variables}, timeout=30)
+            with self._api_lock:
+                self.api_calls += 1
+                if 'X-RateLimit-Remaining' in response.headers:
+                    self.graphql_rate_limit_remaining = int(response.headers['X-RateLimit-Remaining'])
+                if 'X-RateLimit-Reset' in response.headers:
+                    self.graphql_rate_limit_reset = int(response.headers['X-RateLimit-Reset'])
+            
+            if response.status_code == 403:
+                if response.headers.get('X-RateLimit-Remaining') == '0' and not response.headers.get('Retry-After'):
+                    logger.warning("GraphQL rate limit exhausted, using REST until it resets")
+                    return None
+                wait_time = self._rate_limit_wait_time(response)
+                if wait_time is not None:
+                    if not retry_on_rate_limit:
+                        return None
+                    logger.error(f"GraphQL secondary rate limit exceeded, waiting {wait_time:.0f}s...")
+                    time.sleep(wait_time)
+                    return self.make_graphql_request(query, variables, retry_on_rate_limit=False)
+            
+            if response.status_code != 200:
+                self._disable_graphql(f"{response.status_code} - {response.text}")
+                return None
+            
+            payload = response.json()
+            errors = payload.get('errors')
+            if errors:
+                if all(error.get('type') == 'RATE_LIMITED' for error in errors):
+                    # 额度用完时 GraphQL 也可能返回 200 + RATE_LIMITED，额度已由响应头记录
+                    logger.warning("GraphQL rate limit exhausted, using REST until it resets")
+                    return None
+                self._disable_graphql(f"errors: {errors}")
+                return None
+            return payload.get('data')
+            
+        except Exception as e:
+            logger.warning(f"GraphQL request failed: {e}")
+            return None
+    
+    def _disable_graphql(self, reason: str) -> None:
+        """GraphQL 请求失败后关闭 GraphQL，之后的 PR 直接通过 REST 获取"""
+        if self.graphql_enabled:
+            self.graphql_enabled = False
+            logger.warning(f"GraphQL request failed ({reason}), using REST for the remaining PRs")
+    
+    def fetch_pr_bundle(self, owner: str, repo: str, pr_number: int) -> Optional[Dict[str, Optional[List[Dict]]]]:
+        """
+        通过一次 GraphQL 请求获取 PR 的 commits、files、reviews 和 review comments
+        
+        返回的记录转换为与 REST 接口相同的结构；某项超过一页时该项为 None，
+        由调用方回退到 REST 分页获取。整个请求失败时返回 None。
+        """
+        data = self.make_graphql_request(PR_BUNDLE_QUERY, {'owner': owner, 'name': repo, 'number': pr_number})
+        pr = ((data or {}).get('repository') or {}).get('pullRequest')
+        if not pr:
+            return None
+        
+        bundle = {}
+        
+        commits = pr['commits']
+        if commits['pageInfo']['hasNextPage']:
+            bundle['commits'] = None
+        else:
+            bundle['commits'] = [
+                {
+                    'sha': node['commit']['oid'],
+                    'commit': {
+                        'message': node['commit'].get('message', ''),
+                        'author': node['commit'].get('author') or {},
+                        'committer': node['commit'].get('committer') or {}
+                    }
+                }
+                for node in commits['nodes']
+            ]
+        
+        files = pr['files']
+        if files['pageInfo']['hasNextPage']:
+            bundle['files'] = None
+        else:
+            bundle['files'] = [
+                {'filename': node['path'], 'additions': node['additions'], 'deletions': node['deletions']}
+                for node in files['nodes']
+            ]
+        
+        reviews = pr['reviews']
+        if reviews['pageInfo']['hasNextPage']:
+            bundle['reviews'] = None
+        else:
+            bundle['reviews'] = [
+                {
+                    'user': node.get('author') or {},
+                    'body': node.get('body', ''),
+                    'state': node.get('state', ''),
+                    'submitted_at': node.get('submittedAt')
+                }
+                for node in reviews['nodes']
+            ]
+        
+        threads = pr['reviewThreads']
+        if threads['pageInfo']['hasNextPage'] or any(t['comments']['pageInfo']['hasNextPage'] for t in threads['nodes']):
+            bundle['review_comments'] = None
+        else:
+            bundle['review_comments'] = [
+                {
+                    'user': node.get('author') or {},
+                    'body': node.get('body', ''),
+                    'path': node.get('path', ''),
+                    'line': node.get('line'),
+                    'created_at': node.get('createdAt')
+                }
+                for thread in threads['nodes']
+                for node in thread['comments']['nodes']
+            ]
+        
+        return bundle
+    
     def get_commit_details(self, owner: str, repo: str, sha: str) -> Optional[Dict]:
-        """获取 commit 的详细信息"""
+        """获取 commit 的详细信息（按 SHA 不可变，命中磁盘缓存时不发请求）"""
+        cache_key = f"commit:{owner}/{repo}/{sha}"
+        cached = self.cache.get(cache_key)
+        if cached:
+            return _loads(cached[1])
+        
         url = f"{self.base_url}/repos/{owner}/{repo}/commits/{sha}"
-        return self.make_request(url)
+        data = self.make_request(url)
+        if data:
+            self.cache.set(cache_key, _dumps_line(data))
+        return data
+    
+    @classmethod
+    def _should_analyze(cls, file_data: Dict) -> bool:
+        """依赖目录、构建产物、生成文件和超大改动（行数或 patch 体积）不做语义分析（文件变更记录照常保存）"""
+        file_path = file_data.get('filename', '')
+        if file_path.endswith(cls.SKIP_ANALYSIS_SUFFIXES):
+            return False
+        # 目录可能出现在任意层级，如 web/node_modules/...
+        padded_path = '/' + file_path
+        if any(('/' + prefix) in padded_path for prefix in cls.SKIP_ANALYSIS_DIRS):
+            return False
+        if len(file_data.get('patch') or '') > cls.MAX_ANALYZED_PATCH_SIZE:
+            return False
+        return file_data.get('changes', 0) <= cls.MAX_ANALYZED_CHANGES
+    
+    @classmethod
+    def _needs_file_content(cls, file_data: Dict, file_language: Optional[str]) -> bool:
+        """
+        是否需要请求文件在该 commit 时的完整内容来提取导入
+        
+        新增文件的 patch 就是完整内容，可直接还原；删除的文件在该 commit 中已不存在，请求只会得到 404
+        """
+        if not file_language or not cls._should_analyze(file_data):
+            return False
+        change_type = file_data.get('status', 'modified')
+        if change_type == 'removed':
+            return False
+        if change_type == 'added' and file_data.get('patch'):
+            return False
+        return True
     
     def process_pr_data(self, repo_info: Dict, pr_data: Dict, language: str) -> bool:
         """处理单个 PR 的完整数据，保存到JSONL文件"""
@@ -708,12 +1707,35 @@ class MultiLanguageGitHubPRCrawler:
         
         logger.info(f"Processing PR #{pr_number} in {repo_full_name}")
         
+        # 本 PR 产生的记录按输出文件成批写出
+        output_paths = self._output_paths(language)
+        batcher = RecordBatcher(self, self.RECORD_BATCH_BYTES)
+        
         try:
-            # 获取 PR 相关数据
-            commits = self.get_pr_commits(owner, repo_name, pr_number)
-            files = self.get_pr_files(owner, repo_name, pr_number)
-            reviews = self.get_pr_reviews(owner, repo_name, pr_number)
-            review_comments = self.get_pr_review_comments(owner, repo_name, pr_number)
+            # 获取 PR 相关数据：优先一次 GraphQL 请求取回，超过一页或请求失败的部分
+            # 再回退到 REST 接口（互不依赖，并发请求）
+            bundle = self.fetch_pr_bundle(owner, repo_name, pr_number) or {}
+            rest_fetchers = {
+                'commits': self.get_pr_commits,
+                'files': self.get_pr_files,
+                'reviews': self.get_pr_reviews,
+                'review_comments': self.get_pr_review_comments
+            }
+            
+            resources = {}
+            futures = {}
+            for key, fetcher in rest_fetchers.items():
+                if bundle.get(key) is not None:
+                    resources[key] = bundle[key]
+                else:
+                    futures[key] = self.io_pool.submit(fetcher, owner, repo_name, pr_number)
+            for key, future in futures.items():
+                resources[key] = future.result()
+            
+            commits = resources['commits']
+            files = resources['files']
+            reviews = resources['reviews']
+            review_comments = resources['review_comments']
             
             if not commits:
                 logger.warning(f"No commits found for PR #{pr_number}")
@@ -744,7 +1766,7 @@ class MultiLanguageGitHubPRCrawler:
                 'processed_at': datetime.now().isoformat()
             }
             
-            self.save_to_jsonl(pr_record, self.output_dir / f"{language}_pr_data.jsonl")
+            batcher.add(pr_record, output_paths['pr_data'])
             
             # 保存审查评论
             for review in reviews:
@@ -758,7 +1780,7 @@ class MultiLanguageGitHubPRCrawler:
                         'state': review.get('state', ''),
                         'created_at': review.get('submitted_at')
                     }
-                    self.save_to_jsonl(review_record, self.output_dir / f"{language}_review_comments.jsonl")
+                    batcher.add(review_record, output_paths['review_comments'])
             
             for comment in review_comments:
                 if comment.get('body'):
@@ -772,13 +1794,19 @@ class MultiLanguageGitHubPRCrawler:
                         'line_number': comment.get('line'),
                         'created_at': comment.get('created_at')
                     }
-                    self.save_to_jsonl(comment_record, self.output_dir / f"{language}_review_comments.jsonl")
+                    batcher.add(comment_record, output_paths['review_comments'])
+            
+            # 各 commit 的详情互不依赖，先全部并发请求，再按顺序处理
+            commit_details_futures = [
+                self.io_pool.submit(self.get_commit_details, owner, repo_name, commit['sha'])
+                for commit in commits
+            ]
             
             # 处理每个 commit
-            for commit in commits:
+            for commit, commit_details_future in zip(commits, commit_details_futures):
                 commit_hash = commit['sha']
                 
-                commit_details = self.get_commit_details(owner, repo_name, commit_hash)
+                commit_details = commit_details_future.result()
                 if not commit_details:
                     continue
                 
@@ -794,10 +1822,18 @@ class MultiLanguageGitHubPRCrawler:
                     'commit_stats': commit_details.get('stats', {})
                 }
                 
-                self.save_to_jsonl(commit_record, self.output_dir / f"{language}_commits.jsonl")
+                batcher.add(commit_record, output_paths['commits'])
                 
-                # 处理文件变更
+                # 处理文件变更；需要请求文件内容的先并发请求
                 commit_files = commit_details.get('files', [])
+                content_futures = {}
+                for file_data in commit_files:
+                    file_path = file_data.get('filename', '')
+                    if self._needs_file_content(file_data, self.analyzer.get_language_from_file(file_path)):
+                        content_futures[file_path] = self.io_pool.submit(
+                            self.get_file_content_at_commit, owner, repo_name, file_path, commit_hash
+                        )
+                
                 for file_data in commit_files:
                     file_path = file_data.get('filename', '')
                     
@@ -805,105 +1841,109 @@ class MultiLanguageGitHubPRCrawler:
                     file_language = self.analyzer.get_language_from_file(file_path)
                     
                     # 保存文件变更信息
-                    file_change_record = {
-                        'repo_full_name': repo_full_name,
-                        'pr_number': pr_number,
-                        'commit_hash': commit_hash,
-                        'file_path': file_path,
-                        'file_language': file_language,
-                        'change_type': file_data.get('status', 'modified'),
-                        'additions': file_data.get('additions', 0),
-                        'deletions': file_data.get('deletions', 0),
-                        'changes': file_data.get('changes', 0),
-                        'patch_content': file_data.get('patch', '')
-                    }
+                    file_change_record = FileChangeRecord(
+                        repo_full_name,
+                        pr_number,
+                        commit_hash,
+                        file_path,
+                        file_language,
+                        file_data.get('status', 'modified'),
+                        file_data.get('additions', 0),
+                        file_data.get('deletions', 0),
+                        file_data.get('changes', 0),
+                        file_data.get('patch', '')
+                    )
                     
-                    self.save_to_jsonl(file_change_record, self.output_dir / f"{language}_file_changes.jsonl")
+                    batcher.add(file_change_record, output_paths['file_changes'])
                     
                     # 如果文件有对应的语言，进行语义分析
-                    if file_language:
+                    if file_language and self._should_analyze(file_data):
                         patch_content = file_data.get('patch', '')
                         if patch_content:
+                            # 一次扫描 diff，同时得到函数、类变更和 hunks
+                            patch_analysis = self.analyzer.analyze_patch(patch_content, file_language)
+                            
                             # 分析函数变更
-                            functions = self.analyzer.detect_function_changes(patch_content, file_language)
-                            for func in functions:
-                                func_record = {
-                                    'repo_full_name': repo_full_name,
-                                    'pr_number': pr_number,
-                                    'commit_hash': commit_hash,
-                                    'file_path': file_path,
-                                    'file_language': file_language,
-                                    'function_name': func['function_name'],
-                                    'change_type': func['change_type'],
-                                    'line_content': func['line_content'],
-                                    'source': func['source']
-                                }
-                                self.save_to_jsonl(func_record, self.output_dir / f"{language}_function_changes.jsonl")
-                                self.stats['functions_detected'] += 1
+                            for func in patch_analysis['functions']:
+                                func_record = FunctionChangeRecord(
+                                    repo_full_name,
+                                    pr_number,
+                                    commit_hash,
+                                    file_path,
+                                    file_language,
+                                    func['function_name'],
+                                    func['change_type'],
+                                    func['line_content'],
+                                    func['source']
+                                )
+                                batcher.add(func_record, output_paths['function_changes'])
+                                self._add_stat('functions_detected')
                             
                             # 分析类变更
-                            classes = self.analyzer.detect_class_changes(patch_content, file_language)
-                            for cls in classes:
-                                class_record = {
-                                    'repo_full_name': repo_full_name,
-                                    'pr_number': pr_number,
-                                    'commit_hash': commit_hash,
-                                    'file_path': file_path,
-                                    'file_language': file_language,
-                                    'class_name': cls['class_name'],
-                                    'change_type': cls['change_type'],
-                                    'line_content': cls['line_content'],
-                                    'source': cls['source']
-                                }
-                                self.save_to_jsonl(class_record, self.output_dir / f"{language}_class_changes.jsonl")
-                                self.stats['classes_detected'] += 1
+                            for cls in patch_analysis['classes']:
+                                class_record = ClassChangeRecord(
+                                    repo_full_name,
+                                    pr_number,
+                                    commit_hash,
+                                    file_path,
+                                    file_language,
+                                    cls['class_name'],
+                                    cls['change_type'],
+                                    cls['line_content'],
+                                    cls['source']
+                                )
+                                batcher.add(class_record, output_paths['class_changes'])
+                                self._add_stat('classes_detected')
                             
-                            # 保存diff hunks
-                            hunks = self.analyzer.parse_diff_hunks(patch_content)
+                            # 保存diff hunks（analyze_patch 扫描时已一并切分）
+                            hunks = patch_analysis['hunks']
                             for i, hunk in enumerate(hunks):
-                                hunk_record = {
-                                    'repo_full_name': repo_full_name,
-                                    'pr_number': pr_number,
-                                    'commit_hash': commit_hash,
-                                    'file_path': file_path,
-                                    'file_language': file_language,
-                                    'hunk_index': i,
-                                    'old_start': hunk['old_start'],
-                                    'old_count': hunk['old_count'],
-                                    'new_start': hunk['new_start'],
-                                    'new_count': hunk['new_count'],
-                                    'context': hunk['context'],
-                                    'content': '\n'.join(hunk['changes'])
-                                }
-                                self.save_to_jsonl(hunk_record, self.output_dir / f"{language}_diff_hunks.jsonl")
+                                hunk_record = DiffHunkRecord(
+                                    repo_full_name,
+                                    pr_number,
+                                    commit_hash,
+                                    file_path,
+                                    file_language,
+                                    i,
+                                    hunk['old_start'],
+                                    hunk['old_count'],
+                                    hunk['new_start'],
+                                    hunk['new_count'],
+                                    hunk['context'],
+                                    '\n'.join(hunk['changes'])
+                                )
+                                batcher.add(hunk_record, output_paths['diff_hunks'])
                         
-                        # 提取import信息
-                        file_content = self.get_file_content_at_commit(owner, repo_name, file_path, commit_hash)
+                        # 提取import信息：新增文件的 patch 就是完整的文件内容，直接还原，
+                        # 其余需要请求的文件内容已在上面并发请求
+                        if file_path in content_futures:
+                            file_content = content_futures[file_path].result()
+                        elif file_data.get('status') == 'added' and patch_content:
+                            file_content = self.analyzer.reconstruct_new_content(hunks)
+                        else:
+                            file_content = None
                         if file_content:
                             imports = self.analyzer.extract_imports(file_content, file_language)
                             for imp in imports:
-                                import_record = {
-                                    'repo_full_name': repo_full_name,
-                                    'pr_number': pr_number,
-                                    'commit_hash': commit_hash,
-                                    'file_path': file_path,
-                                    'file_language': file_language,
-                                    'import_statement': imp['import_statement'],
-                                    'import_type': imp['import_type'],
-                                    'module_name': imp['module_name'],
-                                    'imported_items': imp.get('imported_items'),
-                                    'line_number': imp['line_number']
-                                }
-                                self.save_to_jsonl(import_record, self.output_dir / f"{language}_imports.jsonl")
-                                self.stats['imports_extracted'] += 1
+                                import_record = ImportRecord(
+                                    repo_full_name,
+                                    pr_number,
+                                    commit_hash,
+                                    file_path,
+                                    file_language,
+                                    imp['import_statement'],
+                                    imp['import_type'],
+                                    imp['module_name'],
+                                    imp.get('imported_items'),
+                                    imp['line_number']
+                                )
+                                batcher.add(import_record, output_paths['imports'])
+                                self._add_stat('imports_extracted')
                     
                     # 更新语言统计
                     if file_language:
-                        if file_language not in self.stats['language_stats']:
-                            self.stats['language_stats'][file_language] = 0
-                        self.stats['language_stats'][file_language] += 1
-                
-                time.sleep(0.3)
+                        with self._stats_lock:
+                            self.stats['language_stats'][file_language] += 1
             
             logger.info(f"Successfully processed PR #{pr_number} with {len(commits)} commits")
             return True
@@ -911,6 +1951,9 @@ class MultiLanguageGitHubPRCrawler:
         except Exception as e:
             logger.error(f"Error processing PR #{pr_number}: {e}")
             return False
+        
+        finally:
+            batcher.flush()
     
     def crawl_language(self, language: str, target_repos: int = 200, max_prs_per_repo: int = None):
         """爬取指定语言的数据并保存到JSONL文件"""
@@ -928,7 +1971,7 @@ class MultiLanguageGitHubPRCrawler:
             return
         
         current_start_index = 0
-        batch_size = 50
+        batch_size = 200
         
         while successfully_processed_repos < target_repos:
             repos_batch = self.load_repos_from_file(
@@ -975,21 +2018,27 @@ class MultiLanguageGitHubPRCrawler:
                     
                     logger.info(f"Processing {len(prs)} PRs for {repo_full_name}")
                     
-                    # 处理所有PR
+                    # 并发处理所有PR，请求速率由共享的 rate_limiter 控制
                     repo_pr_count = 0
-                    for pr_idx, pr in enumerate(prs):
-                        logger.info(f"Processing PR {pr_idx + 1}/{len(prs)} (#{pr['number']})")
+                    pr_futures = {
+                        self.pr_pool.submit(self.process_pr_data, repo, pr, language): pr
+                        for pr in prs
+                    }
+                    for pr_idx, future in enumerate(as_completed(pr_futures)):
+                        pr = pr_futures[future]
+                        logger.info(f"Finished PR {pr_idx + 1}/{len(prs)} (#{pr['number']})")
                         
-                        if self.process_pr_data(repo, pr, language):
+                        if future.result():
                             repo_pr_count += 1
-                            self.stats['total_prs_processed'] += 1
-                        
-                        time.sleep(1)
+                            self._add_stat('total_prs_processed')
                     
                     # 只要成功处理了PR，就计入成功数量
                     if repo_pr_count > 0:
                         successfully_processed_repos += 1
                         processed_repos_set.add(repo_full_name)
+                        # 先确保数据落盘，再更新已处理索引
+                        self.flush_all()
+                        self._mark_processed(language, repo_full_name)
                         self.stats['repos_successfully_processed'] += 1
                         logger.info(f"✅ Completed repo {repo_full_name}: processed {repo_pr_count} PRs")
                         logger.info(f"🎯 Progress: {successfully_processed_repos}/{target_repos} repos completed")
@@ -1013,14 +2062,19 @@ class MultiLanguageGitHubPRCrawler:
         """运行爬虫"""
         logger.info(f"Starting multi-language GitHub PR crawler for languages: {languages}")
         
-        for language in languages:
-            try:
-                self.crawl_language(language, target_repos_per_language, max_prs_per_repo)
-                logger.info(f"Completed language: {language}")
-                time.sleep(5)
-            except Exception as e:
-                logger.error(f"Failed to crawl language {language}: {e}")
-                continue
+        try:
+            for language in languages:
+                try:
+                    self.crawl_language(language, target_repos_per_language, max_prs_per_repo)
+                    logger.info(f"Completed language: {language}")
+                    time.sleep(5)
+                except Exception as e:
+                    logger.error(f"Failed to crawl language {language}: {e}")
+                    continue
+        finally:
+            # 即使中途被中断（如 KeyboardInterrupt），也把缓冲中的记录写完
+            self.close_all()
+            self.cache.close()
         
         logger.info(f"Crawling completed. Total API calls: {self.api_calls}")
         self.print_statistics()
@@ -1040,7 +2094,7 @@ class MultiLanguageGitHubPRCrawler:
         logger.info(f"Functions detected: {self.stats['functions_detected']}")
         logger.info(f"Classes detected: {self.stats['classes_detected']}")
         logger.info(f"Imports extracted: {self.stats['imports_extracted']}")
-        logger.info(f"Language distribution: {self.stats['language_stats']}")
+        logger.info(f"Language distribution: {dict(self.stats['language_stats'])}")
 
 def main():
     """主函数"""
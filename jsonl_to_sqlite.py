@@ -6,40 +6,196 @@ JSONL to SQLite Database Converter
 基于数据库设计图创建的转换脚本，支持多语言数据导入
 """
 
+import argparse
+import io
 import sqlite3
 import json
 import logging
+import logging.handlers
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import hashlib
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('jsonl_to_sqlite.log', encoding='utf-8'),
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 解析一行 JSONL（bytes）：优先使用 orjson，未安装时回退到标准库 json（两者都允许行尾的换行符）
+_loads = orjson.loads if orjson is not None else json.loads
+
+# 导入时使用的 SQL 语句：保持为固定的字符串，以便命中 sqlite3 的预编译语句缓存；
+# SQL_INSERT_<子表> 只到 VALUES 为止，由 _values_sql 按行数补上占位符
+SQL_INSERT_REPOSITORY = """
+    INSERT INTO repositories (owner, name, full_name, language, stars, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(full_name) DO NOTHING
+    RETURNING id
+"""
+
+SQL_INSERT_PULL_REQUEST = """
+    INSERT INTO pull_requests (
+        repo_id, pr_number, title, body, author, state,
+        created_at, merged_at, additions, deletions, changed_files,
+        commits_count, reviews_count, review_comments_count, processed_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(repo_id, pr_number) DO NOTHING
+    RETURNING id
+"""
+
+SQL_INSERT_COMMIT = """
+    INSERT INTO commits (
+        repo_id, pr_id, commit_hash, message, author, author_email,
+        committed_at, additions, deletions, total_changes
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(repo_id, commit_hash) DO NOTHING
+    RETURNING id
+"""
+
+SQL_SELECT_REPOSITORY_ID = "SELECT id FROM repositories WHERE full_name = ?"
+
+SQL_SELECT_PULL_REQUEST_ID = "SELECT id FROM pull_requests WHERE repo_id = ? AND pr_number = ?"
+
+SQL_SELECT_COMMIT_ID = "SELECT id FROM commits WHERE repo_id = ? AND commit_hash = ?"
+
+SQL_SELECT_COMMIT_AND_REPOSITORY_ID = """
+    SELECT c.id, c.repo_id FROM commits c JOIN repositories r ON r.id = c.repo_id
+    WHERE r.full_name = ? AND c.commit_hash = ?
+"""
+
+SQL_INSERT_FILE_CHANGES = """
+    INSERT INTO file_changes (
+        commit_id, file_path, change_type, file_language,
+        additions, deletions, changes, patch_content
+    ) VALUES
+"""
+
+SQL_INSERT_FUNCTION_CHANGES = """
+    INSERT INTO function_changes (
+        file_change_id, function_name, change_type, line_content, source
+    ) VALUES
+"""
+
+SQL_INSERT_CLASS_CHANGES = """
+    INSERT INTO class_changes (
+        file_change_id, class_name, change_type, line_content, source
+    ) VALUES
+"""
+
+SQL_INSERT_DIFF_HUNKS = """
+    INSERT INTO diff_hunks (
+        file_change_id, hunk_index, old_start, old_count,
+        new_start, new_count, context, content
+    ) VALUES
+"""
+
+SQL_INSERT_FILE_IMPORTS = """
+    INSERT INTO file_imports (
+        file_change_id, import_statement, import_type, module_name,
+        imported_items, line_number, last_updated
+    ) VALUES
+"""
+
+SQL_INSERT_REVIEW_COMMENTS = """
+    INSERT INTO review_comments (
+        pr_id, comment_type, reviewer, comment_text,
+        file_path, line_number, state, created_at
+    ) VALUES
+"""
+
+
+# 配置日志：日志文件经 MemoryHandler 缓冲，攒满 1000 条、出现 ERROR 或程序退出时才写入
+LOG_FILE = 'jsonl_to_sqlite.log'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+def _log_handlers() -> List[logging.Handler]:
+    """日志 handler：缓冲写入的日志文件和终端输出"""
+    # basicConfig 的 format 只作用于直接传入的 handler，被 MemoryHandler 包装的 FileHandler 需要单独设置
+    file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8', delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    return [
+        logging.handlers.MemoryHandler(1000, flushLevel=logging.ERROR, target=file_handler),
         logging.StreamHandler()
     ]
-)
+
+
+logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=_log_handlers())
 logger = logging.getLogger(__name__)
 
 
 class JSONLToSQLiteConverter:
     """JSONL文件到SQLite数据库的转换器"""
     
-    def __init__(self, db_path: str = "github_pr_data.db", jsonl_dir: str = "github_pr_data"):
+    # 每处理这么多行 JSONL 输出一次进度日志
+    PROGRESS_LOG_INTERVAL = 100000
+    
+    # 连接时设置的 PRAGMA：WAL 日志 + synchronous=NORMAL（崩溃后数据库仍保持一致），加大页缓存和内存映射
+    CONNECTION_PRAGMAS = (
+        "journal_mode = WAL",
+        "synchronous = NORMAL",
+        "cache_size = -262144",  # 256 MB
+        "temp_store = MEMORY",
+        "mmap_size = 268435456",
+        "busy_timeout = 5000",
+        "wal_autocheckpoint = 10000",
+    )
+    
+    # unsafe_bulk_load 时导入期间额外设置的 PRAGMA：回滚日志只放内存、不 fsync、独占数据库文件、不检查外键
+    UNSAFE_BULK_LOAD_PRAGMAS = (
+        "journal_mode = MEMORY",
+        "synchronous = OFF",
+        "locking_mode = EXCLUSIVE",
+        "foreign_keys = OFF",
+    )
+    
+    def __init__(self, db_path: str = "github_pr_data.db", jsonl_dir: str = "github_pr_data",
+                 commit_interval: int = 50000, insert_batch_size: int = 10000, max_workers: int = 1,
+                 unsafe_bulk_load: bool = False, verify_counts: bool = False):
         """
         初始化转换器
         
         Args:
             db_path: SQLite数据库文件路径
             jsonl_dir: JSONL文件所在目录
+            commit_interval: 每个文件在一个事务中导入，每处理这么多行提交一次并开启新事务，以限制日志文件大小
+            insert_batch_size: 子表记录攒够这么多行后批量插入一次
+            max_workers: 大于 1 且导入多种语言时，各语言在独立进程中导入各自的分片库，再依次合并进主库
+            unsafe_bulk_load: 导入期间关闭日志、fsync 和外键检查以获得最大写入速度，导入结束后恢复并做完整性检查；
+                导入中途崩溃时数据库可能损坏，需要删除后重新导入
+            verify_counts: 结束时额外查询各表的实际记录数（开启 DEBUG 日志时也会查询）
         """
         self.db_path = Path(db_path)
         self.jsonl_dir = Path(jsonl_dir)
+        self.commit_interval = commit_interval
+        self.insert_batch_size = insert_batch_size
+        self.max_workers = max_workers
+        self.unsafe_bulk_load = unsafe_bulk_load
+        self.verify_counts = verify_counts
         self.conn = None
+        self._cursor = None
+        # 单条语句允许的绑定参数个数上限，连接数据库后读取
+        self._max_variable_number = 999
+        self._values_sql_cache: Dict[tuple, str] = {}
+        # 导入前从已有库中删除的索引 DDL，导入完成后由 create_indexes 重建
+        self._index_ddl: List[str] = []
+        
+        # 外键 ID 的内存缓存，避免每行 JSONL 都执行一次 SELECT
+        self.repo_id_cache: Dict[str, int] = {}                       # full_name -> id
+        self.pr_id_cache: Dict[tuple, int] = {}                       # (repo_id, pr_number) -> id
+        self.commit_id_cache: Dict[tuple, int] = {}                   # (repo_id, commit_hash) -> id
+        self.file_change_id_cache: Dict[tuple, int] = {}              # (commit_id, file_path) -> id
+        # file_change_id_cache 已经覆盖到的 file_changes 最大 id
+        self._file_change_cached_upto = 0
         
         # 统计信息
         self.stats = {
@@ -56,9 +212,23 @@ class JSONLToSQLiteConverter:
     
     def connect_db(self):
         """连接到SQLite数据库"""
+        # get_or_create_* 使用的 INSERT ... RETURNING 需要 SQLite 3.35+
+        if sqlite3.sqlite_version_info < (3, 35, 0):
+            raise RuntimeError(f"SQLite 3.35.0 or newer is required, found {sqlite3.sqlite_version}")
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            # isolation_level=None：事务由 _transaction 显式控制
+            self.conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=512)
             self.conn.execute("PRAGMA foreign_keys = ON")  # 启用外键约束
+            for pragma in self.CONNECTION_PRAGMAS:
+                self.conn.execute(f"PRAGMA {pragma}")
+            if self.unsafe_bulk_load:
+                for pragma in self.UNSAFE_BULK_LOAD_PRAGMAS:
+                    self.conn.execute(f"PRAGMA {pragma}")
+                logger.warning("Unsafe bulk load enabled: the database may be corrupted if the import is interrupted")
+            if hasattr(self.conn, 'getlimit'):  # Python 3.11+
+                self._max_variable_number = self.conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+            # 逐行调用的 get_or_create_* / _get_* 共用这一个游标
+            self._cursor = self.conn.cursor()
             logger.info(f"Connected to database: {self.db_path}")
         except Exception as e:
             logger.error(f"Error connecting to database: {e}")
@@ -217,9 +387,7 @@ class JSONLToSQLiteConverter:
                 )
             """)
             
-            # 创建索引以提高查询性能
-            self._create_indexes(cursor)
-            
+            # 索引在数据导入完成后由 create_indexes 统一创建
             self.conn.commit()
             logger.info("Database tables created successfully")
             
@@ -227,8 +395,27 @@ class JSONLToSQLiteConverter:
             logger.error(f"Error creating tables: {e}")
             raise
     
-    def _create_indexes(self, cursor):
-        """创建数据库索引"""
+    def _drop_indexes(self):
+        """导入前删除已有库中的二级索引（唯一约束自动生成的索引不受影响），DDL 记入 _index_ddl 供导入后重建"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL")
+        existing = cursor.fetchall()
+        if not existing:
+            return
+        
+        logger.info(f"Dropping {len(existing)} indexes before import...")
+        with self._transaction():
+            for name, sql in existing:
+                cursor.execute(f'DROP INDEX "{name}"')
+                self._index_ddl.append(sql)
+    
+    def create_indexes(self):
+        """创建数据库索引：在批量导入完成后一次性建立，避免导入时每次 INSERT 都更新索引"""
+        cursor = self.conn.cursor()
+        # 先恢复导入前删除的索引（包括不在下面列表中的自定义索引）
+        for index_sql in self._index_ddl:
+            cursor.execute(index_sql)
+        self._index_ddl.clear()
         indexes = [
             "CREATE INDEX IF NOT EXISTS idx_repositories_full_name ON repositories(full_name)",
             "CREATE INDEX IF NOT EXISTS idx_pull_requests_repo_id ON pull_requests(repo_id)",
@@ -236,7 +423,8 @@ class JSONLToSQLiteConverter:
             "CREATE INDEX IF NOT EXISTS idx_commits_repo_id ON commits(repo_id)",
             "CREATE INDEX IF NOT EXISTS idx_commits_pr_id ON commits(pr_id)",
             "CREATE INDEX IF NOT EXISTS idx_commits_hash ON commits(commit_hash)",
-            "CREATE INDEX IF NOT EXISTS idx_file_changes_commit_id ON file_changes(commit_id)",
+            # (commit_id, file_path) 与按 commit + 文件路径查找 file change 的条件一致，也能服务只按 commit_id 的查询
+            "CREATE INDEX IF NOT EXISTS idx_file_changes_commit_path ON file_changes(commit_id, file_path)",
             "CREATE INDEX IF NOT EXISTS idx_file_changes_language ON file_changes(file_language)",
             "CREATE INDEX IF NOT EXISTS idx_function_changes_file_id ON function_changes(file_change_id)",
             "CREATE INDEX IF NOT EXISTS idx_class_changes_file_id ON class_changes(file_change_id)",
@@ -245,176 +433,443 @@ class JSONLToSQLiteConverter:
             "CREATE INDEX IF NOT EXISTS idx_review_comments_pr_id ON review_comments(pr_id)"
         ]
         
+        logger.info("Creating indexes...")
         for index_sql in indexes:
             cursor.execute(index_sql)
+        # 收集统计信息，让查询规划器在新建的索引之间做出正确选择
+        cursor.execute("ANALYZE")
+        logger.info("Indexes created successfully")
     
-    def get_or_create_repository(self, repo_full_name: str, repo_data: Dict) -> int:
-        """获取或创建repository记录，返回repository ID"""
-        cursor = self.conn.cursor()
-        
-        # 首先尝试查找现有的repository
-        cursor.execute("SELECT id FROM repositories WHERE full_name = ?", (repo_full_name,))
-        result = cursor.fetchone()
+    @contextmanager
+    def _transaction(self):
+        """在一个显式事务中导入一个文件：正常结束时提交，出现异常时回滚"""
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self.conn.execute("BEGIN")
+        try:
+            yield
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.conn.commit()
+    
+    def _commit_checkpoint(self):
+        """提交当前事务并立即开启新事务（长文件导入过程中的检查点）"""
+        self.conn.commit()
+        self.conn.execute("BEGIN")
+    
+    def _insert_batch(self, cursor, insert_prefix: str, batch: List[tuple], label: str) -> int:
+        """批量插入并清空 batch，返回插入的行数；整批失败时回滚这一批并逐行重试，只跳过出错的行"""
+        if not batch:
+            return 0
         
-        if result:
-            return result[0]
+        inserted = len(batch)
+        cursor.execute("SAVEPOINT insert_batch")
+        try:
+            self._bulk_insert(cursor, insert_prefix, batch)
+        except sqlite3.Error as e:
+            logger.warning(f"Batch insert of {len(batch)} {label} records failed ({e}), retrying row by row")
+            cursor.execute("ROLLBACK TO insert_batch")
+            insert_sql = self._values_sql(insert_prefix, len(batch[0]), 1)
+            for row in batch:
+                try:
+                    cursor.execute(insert_sql, row)
+                except sqlite3.Error as row_error:
+                    inserted -= 1
+                    logger.error(f"Error inserting {label} record: {row_error}")
+        cursor.execute("RELEASE insert_batch")
+        batch.clear()
+        return inserted
+    
+    def _bulk_insert(self, cursor, insert_prefix: str, rows: List[tuple]):
+        """用多行 VALUES 的 INSERT 语句插入 rows，按 SQLite 绑定参数个数上限分块执行"""
+        column_count = len(rows[0])
+        chunk_size = max(1, self._max_variable_number // column_count - 1)
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            cursor.execute(
+                self._values_sql(insert_prefix, column_count, len(chunk)),
+                [value for row in chunk for value in row]
+            )
+    
+    def _values_sql(self, insert_prefix: str, column_count: int, row_count: int) -> str:
+        """拼出带 row_count 组占位符的 INSERT 语句；相同语句复用同一个字符串，以命中 sqlite3 的语句缓存"""
+        cache_key = (insert_prefix, column_count, row_count)
+        sql = self._values_sql_cache.get(cache_key)
+        if sql is None:
+            row_placeholders = "(" + ", ".join("?" * column_count) + ")"
+            sql = insert_prefix + ", ".join([row_placeholders] * row_count)
+            self._values_sql_cache[cache_key] = sql
+        return sql
+    
+    def get_or_create_repository(self, repo_full_name: str, repo_data: Dict,
+                                 created_at: Optional[str] = None) -> int:
+        """获取或创建repository记录，返回repository ID；created_at 为新记录的创建时间，默认取当前时间"""
+        repo_id = self.repo_id_cache.get(repo_full_name)
+        if repo_id is not None:
+            return repo_id
         
-        # 如果不存在，创建新的repository
+        cursor = self._cursor
         owner, name = repo_full_name.split('/', 1)
         
-        cursor.execute("""
-            INSERT INTO repositories (owner, name, full_name, language, stars, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
+        # 直接插入；已存在时 DO NOTHING 不返回行，再查出现有记录的 ID
+        cursor.execute(SQL_INSERT_REPOSITORY, (
             owner,
             name,
             repo_full_name,
             repo_data.get('repo_language'),
             repo_data.get('repo_stars', 0),
-            datetime.now().isoformat()
+            created_at or datetime.now().isoformat()
         ))
         
-        repo_id = cursor.lastrowid
-        self.stats['repositories'] += 1
+        result = cursor.fetchone()
+        
+        if result:
+            self.stats['repositories'] += 1
+        else:
+            cursor.execute(SQL_SELECT_REPOSITORY_ID, (repo_full_name,))
+            result = cursor.fetchone()
+        
+        repo_id = result[0]
+        self.repo_id_cache[repo_full_name] = repo_id
         return repo_id
     
     def get_or_create_pull_request(self, repo_id: int, pr_data: Dict) -> int:
         """获取或创建pull request记录，返回PR ID"""
-        cursor = self.conn.cursor()
         pr_number = pr_data['pr_number']
+        cache_key = (repo_id, pr_number)
+        pr_id = self.pr_id_cache.get(cache_key)
+        if pr_id is not None:
+            return pr_id
         
-        # 首先尝试查找现有的PR
-        cursor.execute("SELECT id FROM pull_requests WHERE repo_id = ? AND pr_number = ?", (repo_id, pr_number))
-        result = cursor.fetchone()
+        cursor = self._cursor
+        # 绑定到局部变量，省去逐字段的属性查找
+        get = pr_data.get
+        stats_get = (get('pr_stats') or {}).get
         
-        if result:
-            return result[0]
-        
-        # 如果不存在，创建新的PR
-        pr_stats = pr_data.get('pr_stats', {})
-        
-        cursor.execute("""
-            INSERT INTO pull_requests (
-                repo_id, pr_number, title, body, author, state,
-                created_at, merged_at, additions, deletions, changed_files,
-                commits_count, reviews_count, review_comments_count, processed_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        # 直接插入；已存在时 DO NOTHING 不返回行，再查出现有记录的 ID
+        cursor.execute(SQL_INSERT_PULL_REQUEST, (
             repo_id,
             pr_number,
-            pr_data.get('pr_title'),
-            pr_data.get('pr_body'),
-            pr_data.get('pr_author'),
+            get('pr_title'),
+            get('pr_body'),
+            get('pr_author'),
             'merged',
-            pr_data.get('pr_created_at'),
-            pr_data.get('pr_merged_at'),
-            pr_stats.get('additions', 0),
-            pr_stats.get('deletions', 0),
-            pr_stats.get('changed_files', 0),
-            pr_stats.get('commits_count', 0),
-            pr_stats.get('reviews_count', 0),
-            pr_stats.get('review_comments_count', 0),
-            pr_data.get('processed_at')
+            get('pr_created_at'),
+            get('pr_merged_at'),
+            stats_get('additions', 0),
+            stats_get('deletions', 0),
+            stats_get('changed_files', 0),
+            stats_get('commits_count', 0),
+            stats_get('reviews_count', 0),
+            stats_get('review_comments_count', 0),
+            get('processed_at')
         ))
         
-        pr_id = cursor.lastrowid
-        self.stats['pull_requests'] += 1
+        result = cursor.fetchone()
+        
+        if result:
+            self.stats['pull_requests'] += 1
+        else:
+            cursor.execute(SQL_SELECT_PULL_REQUEST_ID, (repo_id, pr_number))
+            result = cursor.fetchone()
+        
+        pr_id = result[0]
+        self.pr_id_cache[cache_key] = pr_id
         return pr_id
     
     def get_or_create_commit(self, repo_id: int, pr_id: int, commit_data: Dict) -> int:
         """获取或创建commit记录，返回commit ID"""
-        cursor = self.conn.cursor()
         commit_hash = commit_data['commit_hash']
+        cache_key = (repo_id, commit_hash)
+        commit_id = self.commit_id_cache.get(cache_key)
+        if commit_id is not None:
+            return commit_id
         
-        # 首先尝试查找现有的commit
-        cursor.execute("SELECT id FROM commits WHERE repo_id = ? AND commit_hash = ?", (repo_id, commit_hash))
-        result = cursor.fetchone()
-        
-        if result:
-            return result[0]
+        cursor = self._cursor
+        # 绑定到局部变量，省去逐字段的属性查找
+        get = commit_data.get
+        stats_get = (get('commit_stats') or {}).get
         
-        # 如果不存在，创建新的commit
-        commit_stats = commit_data.get('commit_stats', {})
-        
-        cursor.execute("""
-            INSERT INTO commits (
-                repo_id, pr_id, commit_hash, message, author, author_email,
-                committed_at, additions, deletions, total_changes
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        # 直接插入；已存在时 DO NOTHING 不返回行，再查出现有记录的 ID
+        cursor.execute(SQL_INSERT_COMMIT, (
             repo_id,
             pr_id,
             commit_hash,
-            commit_data.get('commit_message'),
-            commit_data.get('commit_author'),
-            commit_data.get('commit_author_email'),
-            commit_data.get('committed_at'),
-            commit_stats.get('additions', 0),
-            commit_stats.get('deletions', 0),
-            commit_stats.get('total', 0)
+            get('commit_message'),
+            get('commit_author'),
+            get('commit_author_email'),
+            get('committed_at'),
+            stats_get('additions', 0),
+            stats_get('deletions', 0),
+            stats_get('total', 0)
         ))
         
-        commit_id = cursor.lastrowid
-        self.stats['commits'] += 1
+        result = cursor.fetchone()
+        
+        if result:
+            self.stats['commits'] += 1
+        else:
+            cursor.execute(SQL_SELECT_COMMIT_ID, (repo_id, commit_hash))
+            result = cursor.fetchone()
+        
+        commit_id = result[0]
+        self.commit_id_cache[cache_key] = commit_id
         return commit_id
     
     def process_jsonl_files(self, languages: List[str]):
         """处理所有JSONL文件"""
-        for language in languages:
-            logger.info(f"Processing {language} data...")
-            
-            # 处理顺序很重要，需要先处理依赖的表
-            self._process_pr_data(language)
-            self._process_commits(language)
-            self._process_file_changes(language)
-            self._process_function_changes(language)
-            self._process_class_changes(language)
-            self._process_diff_hunks(language)
-            self._process_imports(language)
-            self._process_review_comments(language)
-            
-            logger.info(f"Completed processing {language} data")
+        self._drop_indexes()
+        try:
+            if self.max_workers > 1 and len(languages) > 1:
+                self._process_languages_in_parallel(languages)
+            else:
+                for language in languages:
+                    self._process_language(language)
+        except BaseException:
+            # 导入中途失败（包括 KeyboardInterrupt）时也要重建导入前删除的索引，否则已有的库会丢失索引
+            logger.warning("Import interrupted, rebuilding indexes before exiting...")
+            try:
+                self.create_indexes()
+            except sqlite3.Error as e:
+                logger.error(f"Error rebuilding indexes: {e}; missing index DDL: {self._index_ddl}")
+            raise
+        
+        self.create_indexes()
+        if self.unsafe_bulk_load:
+            self._finish_unsafe_bulk_load()
+    
+    def _finish_unsafe_bulk_load(self):
+        """批量导入结束后恢复正常的 PRAGMA 设置，并检查数据库完整性"""
+        self.conn.execute("PRAGMA locking_mode = NORMAL")
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        for pragma in self.CONNECTION_PRAGMAS:
+            self.conn.execute(f"PRAGMA {pragma}")
+        
+        logger.info("Running integrity check...")
+        result = [row[0] for row in self.conn.execute("PRAGMA integrity_check")]
+        if result == ['ok']:
+            logger.info("Integrity check passed")
+        else:
+            logger.error(f"Integrity check failed: {result[:10]}")
+    
+    def _process_language(self, language: str):
+        """导入一种语言的全部JSONL文件"""
+        logger.info(f"Processing {language} data...")
+        
+        # 处理顺序很重要，需要先处理依赖的表
+        self._process_pr_data(language)
+        self._process_commits(language)
+        self._process_file_changes(language)
+        self._cache_file_change_ids()
+        self._process_function_changes(language)
+        self._process_class_changes(language)
+        self._process_diff_hunks(language)
+        self._process_imports(language)
+        self._process_review_comments(language)
+        
+        logger.info(f"Completed processing {language} data")
+    
+    def _process_languages_in_parallel(self, languages: List[str]):
+        """每种语言在独立进程中导入到各自的分片库，再按 languages 的顺序逐个合并进主库"""
+        shard_paths = {
+            language: self.db_path.with_name(f"{self.db_path.stem}.{language}.shard{self.db_path.suffix}")
+            for language in languages
+        }
+        for shard_path in shard_paths.values():
+            _remove_db_files(shard_path)
+        
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(languages)),
+                                 initializer=_init_shard_worker_logging) as executor:
+            futures = {
+                language: executor.submit(
+                    _convert_language_shard, str(shard_paths[language]), str(self.jsonl_dir),
+                    language, self.commit_interval, self.insert_batch_size, self.unsafe_bulk_load
+                )
+                for language in languages
+            }
+            for language in languages:
+                futures[language].result()
+                logger.info(f"Merging {language} shard into {self.db_path}")
+                self._merge_shard(shard_paths[language])
+                _remove_db_files(shard_paths[language])
+    
+    def _merge_shard(self, shard_path: Path):
+        """
+        把一个分片库合并进主库：仓库、PR、commit 按唯一键去重并重映射 ID，file_changes 整体平移 ID
+
+        子表的 file_change_id 与顺序导入一样，改指向主库中同一 (commit_id, file_path) 最早的 file_changes 记录
+        （可能是之前合并的语言中已有的记录）
+        """
+        cursor = self.conn.cursor()
+        cursor.execute("ATTACH DATABASE ? AS shard", (str(shard_path),))
+        try:
+            with self._transaction():
+                self._merge_table(
+                    cursor, 'repositories',
+                    where="NOT EXISTS (SELECT 1 FROM main.repositories m WHERE m.full_name = s.full_name)",
+                    conflict="ON CONFLICT(full_name) DO NOTHING"
+                )
+                cursor.execute("""
+                    CREATE TEMP TABLE repo_map AS
+                    SELECT s.id AS old_id, m.id AS new_id
+                    FROM shard.repositories s JOIN main.repositories m ON m.full_name = s.full_name
+                """)
+                
+                self._merge_table(
+                    cursor, 'pull_requests', {'repo_id': 'rm.new_id'},
+                    joins="JOIN repo_map rm ON rm.old_id = s.repo_id",
+                    where="NOT EXISTS (SELECT 1 FROM main.pull_requests m "
+                          "WHERE m.repo_id = rm.new_id AND m.pr_number = s.pr_number)",
+                    conflict="ON CONFLICT(repo_id, pr_number) DO NOTHING"
+                )
+                cursor.execute("""
+                    CREATE TEMP TABLE pr_map AS
+                    SELECT s.id AS old_id, m.id AS new_id
+                    FROM shard.pull_requests s
+                    JOIN repo_map rm ON rm.old_id = s.repo_id
+                    JOIN main.pull_requests m ON m.repo_id = rm.new_id AND m.pr_number = s.pr_number
+                """)
+                
+                self._merge_table(
+                    cursor, 'commits', {'repo_id': 'rm.new_id', 'pr_id': 'pm.new_id'},
+                    joins="JOIN repo_map rm ON rm.old_id = s.repo_id JOIN pr_map pm ON pm.old_id = s.pr_id",
+                    where="NOT EXISTS (SELECT 1 FROM main.commits m "
+                          "WHERE m.repo_id = rm.new_id AND m.commit_hash = s.commit_hash)",
+                    conflict="ON CONFLICT(repo_id, commit_hash) DO NOTHING"
+                )
+                cursor.execute("""
+                    CREATE TEMP TABLE commit_map AS
+                    SELECT s.id AS old_id, m.id AS new_id
+                    FROM shard.commits s
+                    JOIN repo_map rm ON rm.old_id = s.repo_id
+                    JOIN main.commits m ON m.repo_id = rm.new_id AND m.commit_hash = s.commit_hash
+                """)
+                
+                # file_changes 没有唯一键：保留分片中的 ID 并整体加上偏移量，子表的 file_change_id 加同样的偏移量即可
+                cursor.execute("SELECT IFNULL(MAX(id), 0) FROM main.file_changes")
+                id_offset = cursor.fetchone()[0]
+                self._merge_table(
+                    cursor, 'file_changes', {'id': 's.id + ?', 'commit_id': 'cm.new_id'},
+                    joins="JOIN commit_map cm ON cm.old_id = s.commit_id", params=(id_offset,)
+                )
+                # 主库中本分片涉及的每个 (commit_id, file_path) 最早的记录，与 _cache_file_change_ids 的 setdefault 一致
+                cursor.execute("""
+                    CREATE TEMP TABLE first_file_change (
+                        commit_id INTEGER, file_path TEXT, id INTEGER,
+                        PRIMARY KEY (commit_id, file_path)
+                    ) WITHOUT ROWID
+                """)
+                cursor.execute("""
+                    INSERT INTO first_file_change
+                    SELECT commit_id, file_path, MIN(id) FROM main.file_changes
+                    WHERE commit_id IN (SELECT new_id FROM commit_map)
+                    GROUP BY commit_id, file_path
+                """)
+                cursor.execute("""
+                    CREATE TEMP TABLE file_change_map AS
+                    SELECT s.id AS old_id, f.id AS new_id
+                    FROM shard.file_changes s
+                    JOIN commit_map cm ON cm.old_id = s.commit_id
+                    JOIN first_file_change f ON f.commit_id = cm.new_id AND f.file_path = s.file_path
+                """)
+                cursor.execute("CREATE UNIQUE INDEX temp.idx_file_change_map_old_id ON file_change_map(old_id)")
+                for table in ('function_changes', 'class_changes', 'diff_hunks', 'file_imports'):
+                    self._merge_table(
+                        cursor, table, {'file_change_id': 'fm.new_id'},
+                        joins="JOIN file_change_map fm ON fm.old_id = s.file_change_id"
+                    )
+                
+                self._merge_table(
+                    cursor, 'review_comments', {'pr_id': 'pm.new_id'},
+                    joins="JOIN pr_map pm ON pm.old_id = s.pr_id"
+                )
+                
+                for map_table in ('repo_map', 'pr_map', 'commit_map', 'first_file_change', 'file_change_map'):
+                    cursor.execute(f"DROP TABLE temp.{map_table}")
+        finally:
+            cursor.execute("DETACH DATABASE shard")
+    
+    def _merge_table(self, cursor, table: str, column_exprs: Optional[Dict[str, str]] = None,
+                     joins: str = "", where: str = "true", conflict: str = "", params: tuple = ()):
+        """
+        用一条 INSERT ... SELECT 把分片库中的 table 整表复制进主库；column_exprs 覆盖需要改写的列（含 id 时保留并改写 ID）
+        
+        where 用 NOT EXISTS 预先排除主库中已有的记录：只靠 ON CONFLICT DO NOTHING 跳过时，
+        AUTOINCREMENT 的序号仍会被这些行占用，合并后的 ID 就与顺序导入不一致
+        """
+        column_exprs = column_exprs or {}
+        cursor.execute(f"PRAGMA main.table_info({table})")
+        columns = [row[1] for row in cursor.fetchall() if row[1] != 'id' or 'id' in column_exprs]
+        select_exprs = [column_exprs.get(column, f"s.{column}") for column in columns]
+        cursor.execute(f"""
+            INSERT INTO main.{table} ({', '.join(columns)})
+            SELECT {', '.join(select_exprs)} FROM shard.{table} s {joins}
+            WHERE {where} ORDER BY s.id
+            {conflict}
+        """, params)
+        self.stats[table] += cursor.rowcount
+    
+    def _jsonl_path(self, language: str, record_type: str) -> Optional[Path]:
+        """返回一类记录的 JSONL 文件路径，没有未压缩文件时使用 crawler 以 compress_output 写出的 .jsonl.zst；都不存在时返回 None"""
+        file_path = self.jsonl_dir / f"{language}_{record_type}.jsonl"
+        if file_path.exists():
+            return file_path
+        
+        compressed_path = file_path.with_name(file_path.name + '.zst')
+        if compressed_path.exists():
+            if zstandard is None:
+                logger.error(f"Cannot read {compressed_path}: zstandard is not installed (pip install zstandard)")
+                return None
+            return compressed_path
+        
+        logger.warning(f"File not found: {file_path}")
+        return None
     
     def _process_pr_data(self, language: str):
         """处理PR数据文件"""
-        file_path = self.jsonl_dir / f"{language}_pr_data.jsonl"
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        file_path = self._jsonl_path(language, 'pr_data')
+        if file_path is None:
             return
         
         logger.info(f"Processing PR data from {file_path}")
+        # 同一文件中新建的仓库共用一个创建时间，避免逐行调用 datetime.now()
+        now_iso = datetime.now().isoformat()
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with self._transaction(), _open_jsonl(file_path) as f:
             for line_num, line in enumerate(f, 1):
+                if line.isspace():  # 跳过空行
+                    continue
                 try:
-                    data = json.loads(line.strip())
-                    repo_id = self.get_or_create_repository(data['repo_full_name'], data)
+                    data = _loads(line)
+                    repo_id = self.get_or_create_repository(data['repo_full_name'], data, now_iso)
                     self.get_or_create_pull_request(repo_id, data)
                     
-                    if line_num % 100 == 0:
-                        self.conn.commit()
+                    if line_num % self.commit_interval == 0:
+                        self._commit_checkpoint()
+                    if line_num % self.PROGRESS_LOG_INTERVAL == 0:
                         logger.info(f"Processed {line_num} PR records")
                         
                 except Exception as e:
                     logger.error(f"Error processing PR data line {line_num}: {e}")
                     continue
         
-        self.conn.commit()
         logger.info(f"Completed processing PR data from {file_path}")
     
     def _process_commits(self, language: str):
         """处理commit数据文件"""
-        file_path = self.jsonl_dir / f"{language}_commits.jsonl"
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        file_path = self._jsonl_path(language, 'commits')
+        if file_path is None:
             return
         
         logger.info(f"Processing commits from {file_path}")
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with self._transaction(), _open_jsonl(file_path) as f:
             for line_num, line in enumerate(f, 1):
+                if line.isspace():  # 跳过空行
+                    continue
                 try:
-                    data = json.loads(line.strip())
+                    data = _loads(line)
                     
                     # 获取repo_id和pr_id
                     repo_id = self._get_repo_id(data['repo_full_name'])
@@ -423,42 +878,39 @@ class JSONLToSQLiteConverter:
                     if repo_id and pr_id:
                         self.get_or_create_commit(repo_id, pr_id, data)
                     
-                    if line_num % 100 == 0:
-                        self.conn.commit()
+                    if line_num % self.commit_interval == 0:
+                        self._commit_checkpoint()
+                    if line_num % self.PROGRESS_LOG_INTERVAL == 0:
                         logger.info(f"Processed {line_num} commit records")
                         
                 except Exception as e:
                     logger.error(f"Error processing commit data line {line_num}: {e}")
                     continue
         
-        self.conn.commit()
         logger.info(f"Completed processing commits from {file_path}")
     
     def _process_file_changes(self, language: str):
         """处理文件变更数据"""
-        file_path = self.jsonl_dir / f"{language}_file_changes.jsonl"
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        file_path = self._jsonl_path(language, 'file_changes')
+        if file_path is None:
             return
         
         logger.info(f"Processing file changes from {file_path}")
         cursor = self.conn.cursor()
+        batch = []
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with self._transaction(), _open_jsonl(file_path) as f:
             for line_num, line in enumerate(f, 1):
+                if line.isspace():  # 跳过空行
+                    continue
                 try:
-                    data = json.loads(line.strip())
+                    data = _loads(line)
                     
                     # 获取commit_id
                     commit_id = self._get_commit_id(data['repo_full_name'], data['commit_hash'])
                     
                     if commit_id:
-                        cursor.execute("""
-                            INSERT INTO file_changes (
-                                commit_id, file_path, change_type, file_language,
-                                additions, deletions, changes, patch_content
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
+                        batch.append((
                             commit_id,
                             data['file_path'],
                             data['change_type'],
@@ -468,34 +920,38 @@ class JSONLToSQLiteConverter:
                             data.get('changes', 0),
                             data.get('patch_content')
                         ))
-                        
-                        self.stats['file_changes'] += 1
+                        if len(batch) >= self.insert_batch_size:
+                            self.stats['file_changes'] += self._insert_batch(cursor, SQL_INSERT_FILE_CHANGES, batch, 'file change')
                     
-                    if line_num % 100 == 0:
-                        self.conn.commit()
+                    if line_num % self.commit_interval == 0:
+                        self._commit_checkpoint()
+                    if line_num % self.PROGRESS_LOG_INTERVAL == 0:
                         logger.info(f"Processed {line_num} file change records")
                         
                 except Exception as e:
                     logger.error(f"Error processing file change data line {line_num}: {e}")
                     continue
+            
+            self.stats['file_changes'] += self._insert_batch(cursor, SQL_INSERT_FILE_CHANGES, batch, 'file change')
         
-        self.conn.commit()
         logger.info(f"Completed processing file changes from {file_path}")
     
     def _process_function_changes(self, language: str):
         """处理函数变更数据"""
-        file_path = self.jsonl_dir / f"{language}_function_changes.jsonl"
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        file_path = self._jsonl_path(language, 'function_changes')
+        if file_path is None:
             return
         
         logger.info(f"Processing function changes from {file_path}")
         cursor = self.conn.cursor()
+        batch = []
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with self._transaction(), _open_jsonl(file_path) as f:
             for line_num, line in enumerate(f, 1):
+                if line.isspace():  # 跳过空行
+                    continue
                 try:
-                    data = json.loads(line.strip())
+                    data = _loads(line)
                     
                     # 获取file_change_id
                     file_change_id = self._get_file_change_id(
@@ -505,45 +961,45 @@ class JSONLToSQLiteConverter:
                     )
                     
                     if file_change_id:
-                        cursor.execute("""
-                            INSERT INTO function_changes (
-                                file_change_id, function_name, change_type, line_content, source
-                            ) VALUES (?, ?, ?, ?, ?)
-                        """, (
+                        batch.append((
                             file_change_id,
                             data['function_name'],
                             data['change_type'],
                             data.get('line_content'),
                             data.get('source')
                         ))
-                        
-                        self.stats['function_changes'] += 1
+                        if len(batch) >= self.insert_batch_size:
+                            self.stats['function_changes'] += self._insert_batch(cursor, SQL_INSERT_FUNCTION_CHANGES, batch, 'function change')
                     
-                    if line_num % 100 == 0:
-                        self.conn.commit()
+                    if line_num % self.commit_interval == 0:
+                        self._commit_checkpoint()
+                    if line_num % self.PROGRESS_LOG_INTERVAL == 0:
                         logger.info(f"Processed {line_num} function change records")
                         
                 except Exception as e:
                     logger.error(f"Error processing function change data line {line_num}: {e}")
                     continue
+            
+            self.stats['function_changes'] += self._insert_batch(cursor, SQL_INSERT_FUNCTION_CHANGES, batch, 'function change')
         
-        self.conn.commit()
         logger.info(f"Completed processing function changes from {file_path}")
     
     def _process_class_changes(self, language: str):
         """处理类变更数据"""
-        file_path = self.jsonl_dir / f"{language}_class_changes.jsonl"
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        file_path = self._jsonl_path(language, 'class_changes')
+        if file_path is None:
             return
         
         logger.info(f"Processing class changes from {file_path}")
         cursor = self.conn.cursor()
+        batch = []
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with self._transaction(), _open_jsonl(file_path) as f:
             for line_num, line in enumerate(f, 1):
+                if line.isspace():  # 跳过空行
+                    continue
                 try:
-                    data = json.loads(line.strip())
+                    data = _loads(line)
                     
                     # 获取file_change_id
                     file_change_id = self._get_file_change_id(
@@ -553,45 +1009,45 @@ class JSONLToSQLiteConverter:
                     )
                     
                     if file_change_id:
-                        cursor.execute("""
-                            INSERT INTO class_changes (
-                                file_change_id, class_name, change_type, line_content, source
-                            ) VALUES (?, ?, ?, ?, ?)
-                        """, (
+                        batch.append((
                             file_change_id,
                             data['class_name'],
                             data['change_type'],
                             data.get('line_content'),
                             data.get('source')
                         ))
-                        
-                        self.stats['class_changes'] += 1
+                        if len(batch) >= self.insert_batch_size:
+                            self.stats['class_changes'] += self._insert_batch(cursor, SQL_INSERT_CLASS_CHANGES, batch, 'class change')
                     
-                    if line_num % 100 == 0:
-                        self.conn.commit()
+                    if line_num % self.commit_interval == 0:
+                        self._commit_checkpoint()
+                    if line_num % self.PROGRESS_LOG_INTERVAL == 0:
                         logger.info(f"Processed {line_num} class change records")
                         
                 except Exception as e:
                     logger.error(f"Error processing class change data line {line_num}: {e}")
                     continue
+            
+            self.stats['class_changes'] += self._insert_batch(cursor, SQL_INSERT_CLASS_CHANGES, batch, 'class change')
         
-        self.conn.commit()
         logger.info(f"Completed processing class changes from {file_path}")
     
     def _process_diff_hunks(self, language: str):
         """处理diff hunks数据"""
-        file_path = self.jsonl_dir / f"{language}_diff_hunks.jsonl"
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        file_path = self._jsonl_path(language, 'diff_hunks')
+        if file_path is None:
             return
         
         logger.info(f"Processing diff hunks from {file_path}")
         cursor = self.conn.cursor()
+        batch = []
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with self._transaction(), _open_jsonl(file_path) as f:
             for line_num, line in enumerate(f, 1):
+                if line.isspace():  # 跳过空行
+                    continue
                 try:
-                    data = json.loads(line.strip())
+                    data = _loads(line)
                     
                     # 获取file_change_id
                     file_change_id = self._get_file_change_id(
@@ -601,12 +1057,7 @@ class JSONLToSQLiteConverter:
                     )
                     
                     if file_change_id:
-                        cursor.execute("""
-                            INSERT INTO diff_hunks (
-                                file_change_id, hunk_index, old_start, old_count,
-                                new_start, new_count, context, content
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
+                        batch.append((
                             file_change_id,
                             data['hunk_index'],
                             data['old_start'],
@@ -616,34 +1067,40 @@ class JSONLToSQLiteConverter:
                             data.get('context'),
                             data.get('content')
                         ))
-                        
-                        self.stats['diff_hunks'] += 1
+                        if len(batch) >= self.insert_batch_size:
+                            self.stats['diff_hunks'] += self._insert_batch(cursor, SQL_INSERT_DIFF_HUNKS, batch, 'diff hunk')
                     
-                    if line_num % 100 == 0:
-                        self.conn.commit()
+                    if line_num % self.commit_interval == 0:
+                        self._commit_checkpoint()
+                    if line_num % self.PROGRESS_LOG_INTERVAL == 0:
                         logger.info(f"Processed {line_num} diff hunk records")
                         
                 except Exception as e:
                     logger.error(f"Error processing diff hunk data line {line_num}: {e}")
                     continue
+            
+            self.stats['diff_hunks'] += self._insert_batch(cursor, SQL_INSERT_DIFF_HUNKS, batch, 'diff hunk')
         
-        self.conn.commit()
         logger.info(f"Completed processing diff hunks from {file_path}")
     
     def _process_imports(self, language: str):
         """处理导入数据"""
-        file_path = self.jsonl_dir / f"{language}_imports.jsonl"
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        file_path = self._jsonl_path(language, 'imports')
+        if file_path is None:
             return
         
         logger.info(f"Processing imports from {file_path}")
         cursor = self.conn.cursor()
+        batch = []
+        # 同一文件的导入记录共用一个更新时间，避免逐行调用 datetime.now()
+        now_iso = datetime.now().isoformat()
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with self._transaction(), _open_jsonl(file_path) as f:
             for line_num, line in enumerate(f, 1):
+                if line.isspace():  # 跳过空行
+                    continue
                 try:
-                    data = json.loads(line.strip())
+                    data = _loads(line)
                     
                     # 获取file_change_id
                     file_change_id = self._get_file_change_id(
@@ -662,60 +1119,54 @@ class JSONLToSQLiteConverter:
                         else:
                             imported_items = str(imported_items)
                         
-                        cursor.execute("""
-                            INSERT INTO file_imports (
-                                file_change_id, import_statement, import_type, module_name,
-                                imported_items, line_number, last_updated
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                        """, (
+                        batch.append((
                             file_change_id,
                             data['import_statement'],
                             data.get('import_type'),
                             data.get('module_name'),
                             imported_items,
                             data.get('line_number'),
-                            datetime.now().isoformat()
+                            now_iso
                         ))
-                        
-                        self.stats['file_imports'] += 1
+                        if len(batch) >= self.insert_batch_size:
+                            self.stats['file_imports'] += self._insert_batch(cursor, SQL_INSERT_FILE_IMPORTS, batch, 'import')
                     
-                    if line_num % 100 == 0:
-                        self.conn.commit()
+                    if line_num % self.commit_interval == 0:
+                        self._commit_checkpoint()
+                    if line_num % self.PROGRESS_LOG_INTERVAL == 0:
                         logger.info(f"Processed {line_num} import records")
                         
                 except Exception as e:
                     logger.error(f"Error processing import data line {line_num}: {e}")
                     continue
+            
+            self.stats['file_imports'] += self._insert_batch(cursor, SQL_INSERT_FILE_IMPORTS, batch, 'import')
         
-        self.conn.commit()
         logger.info(f"Completed processing imports from {file_path}")
     
     def _process_review_comments(self, language: str):
         """处理审查评论数据"""
-        file_path = self.jsonl_dir / f"{language}_review_comments.jsonl"
-        if not file_path.exists():
-            logger.warning(f"File not found: {file_path}")
+        file_path = self._jsonl_path(language, 'review_comments')
+        if file_path is None:
             return
         
         logger.info(f"Processing review comments from {file_path}")
         cursor = self.conn.cursor()
+        batch = []
         
-        with open(file_path, 'r', encoding='utf-8') as f:
+        with self._transaction(), _open_jsonl(file_path) as f:
             for line_num, line in enumerate(f, 1):
+                if line.isspace():  # 跳过空行
+                    continue
                 try:
-                    data = json.loads(line.strip())
+                    data = _loads(line)
                     
                     # 获取pr_id
                     repo_id = self._get_repo_id(data['repo_full_name'])
                     pr_id = self._get_pr_id(repo_id, data['pr_number'])
                     
                     if pr_id:
-                        cursor.execute("""
-                            INSERT INTO review_comments (
-                                pr_id, comment_type, reviewer, comment_text,
-                                file_path, line_number, state, created_at
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (
+                        batch.append((
                             pr_id,
                             data['comment_type'],
                             data.get('reviewer'),
@@ -725,55 +1176,98 @@ class JSONLToSQLiteConverter:
                             data.get('state'),
                             data.get('created_at')
                         ))
-                        
-                        self.stats['review_comments'] += 1
+                        if len(batch) >= self.insert_batch_size:
+                            self.stats['review_comments'] += self._insert_batch(cursor, SQL_INSERT_REVIEW_COMMENTS, batch, 'review comment')
                     
-                    if line_num % 100 == 0:
-                        self.conn.commit()
+                    if line_num % self.commit_interval == 0:
+                        self._commit_checkpoint()
+                    if line_num % self.PROGRESS_LOG_INTERVAL == 0:
                         logger.info(f"Processed {line_num} review comment records")
                         
                 except Exception as e:
                     logger.error(f"Error processing review comment data line {line_num}: {e}")
                     continue
+            
+            self.stats['review_comments'] += self._insert_batch(cursor, SQL_INSERT_REVIEW_COMMENTS, batch, 'review comment')
         
-        self.conn.commit()
         logger.info(f"Completed processing review comments from {file_path}")
     
     def _get_repo_id(self, repo_full_name: str) -> Optional[int]:
         """根据仓库全名获取repository ID"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM repositories WHERE full_name = ?", (repo_full_name,))
+        repo_id = self.repo_id_cache.get(repo_full_name)
+        if repo_id is not None:
+            return repo_id
+        cursor = self._cursor
+        cursor.execute(SQL_SELECT_REPOSITORY_ID, (repo_full_name,))
         result = cursor.fetchone()
-        return result[0] if result else None
+        if not result:
+            return None
+        self.repo_id_cache[repo_full_name] = result[0]
+        return result[0]
     
     def _get_pr_id(self, repo_id: int, pr_number: int) -> Optional[int]:
         """根据仓库ID和PR号获取pull request ID"""
         if not repo_id:
             return None
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM pull_requests WHERE repo_id = ? AND pr_number = ?", (repo_id, pr_number))
+        cache_key = (repo_id, pr_number)
+        pr_id = self.pr_id_cache.get(cache_key)
+        if pr_id is not None:
+            return pr_id
+        cursor = self._cursor
+        cursor.execute(SQL_SELECT_PULL_REQUEST_ID, (repo_id, pr_number))
         result = cursor.fetchone()
-        return result[0] if result else None
+        if not result:
+            return None
+        self.pr_id_cache[cache_key] = result[0]
+        return result[0]
     
     def _get_commit_id(self, repo_full_name: str, commit_hash: str) -> Optional[int]:
         """根据仓库全名和commit hash获取commit ID"""
-        repo_id = self._get_repo_id(repo_full_name)
-        if not repo_id:
-            return None
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM commits WHERE repo_id = ? AND commit_hash = ?", (repo_id, commit_hash))
+        cursor = self._cursor
+        repo_id = self.repo_id_cache.get(repo_full_name)
+        if repo_id is None:
+            # 仓库 ID 也未缓存：一条语句同时查出 commit 和仓库的 ID
+            cursor.execute(SQL_SELECT_COMMIT_AND_REPOSITORY_ID, (repo_full_name, commit_hash))
+            result = cursor.fetchone()
+            if not result:
+                return None
+            commit_id, repo_id = result
+            self.repo_id_cache[repo_full_name] = repo_id
+            self.commit_id_cache[(repo_id, commit_hash)] = commit_id
+            return commit_id
+        
+        cache_key = (repo_id, commit_hash)
+        commit_id = self.commit_id_cache.get(cache_key)
+        if commit_id is not None:
+            return commit_id
+        cursor.execute(SQL_SELECT_COMMIT_ID, (repo_id, commit_hash))
         result = cursor.fetchone()
-        return result[0] if result else None
+        if not result:
+            return None
+        self.commit_id_cache[cache_key] = result[0]
+        return result[0]
     
     def _get_file_change_id(self, repo_full_name: str, commit_hash: str, file_path: str) -> Optional[int]:
-        """根据仓库全名、commit hash和文件路径获取file change ID"""
-        commit_id = self._get_commit_id(repo_full_name, commit_hash)
-        if not commit_id:
-            return None
+        """根据仓库全名、commit hash和文件路径获取file change ID（同一文件有多条记录时取最早的一条）"""
+        # 直接查两级缓存，只有未命中时才走 _get_commit_id
+        commit_id = self.commit_id_cache.get((self.repo_id_cache.get(repo_full_name), commit_hash))
+        if commit_id is None:
+            commit_id = self._get_commit_id(repo_full_name, commit_hash)
+            if not commit_id:
+                return None
+        return self.file_change_id_cache.get((commit_id, file_path))
+    
+    def _cache_file_change_ids(self):
+        """把尚未缓存的 file_changes 记录一次性读入 file_change_id_cache"""
         cursor = self.conn.cursor()
-        cursor.execute("SELECT id FROM file_changes WHERE commit_id = ? AND file_path = ?", (commit_id, file_path))
-        result = cursor.fetchone()
-        return result[0] if result else None
+        cursor.execute(
+            "SELECT commit_id, file_path, id FROM file_changes WHERE id > ? ORDER BY id",
+            (self._file_change_cached_upto,)
+        )
+        cache = self.file_change_id_cache
+        for commit_id, file_path, file_change_id in cursor:
+            cache.setdefault((commit_id, file_path), file_change_id)
+            self._file_change_cached_upto = file_change_id
     
     def print_statistics(self):
         """打印转换统计信息"""
@@ -781,20 +1275,37 @@ class JSONLToSQLiteConverter:
         for table, count in self.stats.items():
             logger.info(f"{table}: {count}")
         
-        # 查询数据库中的实际记录数
-        cursor = self.conn.cursor()
-        tables = ['repositories', 'pull_requests', 'commits', 'file_changes', 
-                 'function_changes', 'class_changes', 'diff_hunks', 'file_imports', 'review_comments']
+        # stats 在导入时已逐表累计，实际记录数需要全表扫描，只在核对时查询
+        if not (self.verify_counts or logger.isEnabledFor(logging.DEBUG)):
+            return
+        
+        cursor = self._cursor
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid")
+        tables = [row[0] for row in cursor.fetchall()]
         
         logger.info("=== Database Record Counts ===")
-        for table in tables:
-            cursor.execute(f"SELECT COUNT(*) FROM {table}")
-            count = cursor.fetchone()[0]
+        # 一条语句取回所有表的记录数
+        cursor.execute("SELECT " + ", ".join(f"(SELECT COUNT(*) FROM {table})" for table in tables))
+        for table, count in zip(tables, cursor.fetchone()):
             logger.info(f"{table}: {count}")
     
     def close(self):
         """关闭数据库连接"""
         if self.conn:
+            if self.conn.in_transaction:
+                # 被 KeyboardInterrupt 等中断时事务仍未结束：提交已经写入的记录，与检查点一样保留导入进度
+                try:
+                    self.conn.commit()
+                    logger.warning("Committed the unfinished transaction before closing")
+                except sqlite3.Error as e:
+                    logger.warning(f"Error committing unfinished transaction: {e}")
+                    self.conn.rollback()
+            try:
+                # 更新查询规划统计信息，并把 WAL 内容写回主库后截断 WAL 文件
+                self.conn.execute("PRAGMA optimize")
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error as e:
+                logger.warning(f"Error optimizing database before close: {e}")
             self.conn.close()
             logger.info("Database connection closed")
     
@@ -817,8 +1328,61 @@ class JSONLToSQLiteConverter:
             self.close()
 
 
+def _open_jsonl(file_path: Path):
+    """以二进制方式打开 JSONL 文件按行读取；.zst 文件流式解压（crawler 每处理完一个仓库结束一个压缩帧）"""
+    if file_path.suffix == '.zst':
+        reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, 'rb'), read_across_frames=True)
+        return io.BufferedReader(reader, buffer_size=1 << 20)
+    return open(file_path, 'rb')
+
+
+def _remove_db_files(db_path: Path):
+    """删除 SQLite 数据库文件及其 WAL/SHM 文件"""
+    for suffix in ('', '-wal', '-shm'):
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+
+
+def _init_shard_worker_logging():
+    """
+    子进程初始化：换上子进程自己的日志 handler
+    
+    fork 出的子进程继承了主进程 MemoryHandler 的缓冲，其中是主进程已经记录的日志，刷新时会重复写入，
+    先清空再替换；子进程以 os._exit 退出，不会刷新缓冲，由 _convert_language_shard 在每个任务结束时刷新
+    """
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.handlers.MemoryHandler):
+            handler.buffer.clear()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, handlers=_log_handlers(), force=True)
+
+
+def _convert_language_shard(db_path: str, jsonl_dir: str, language: str,
+                            commit_interval: int, insert_batch_size: int, unsafe_bulk_load: bool):
+    """子进程入口：把一种语言的JSONL文件导入独立的分片库（不建索引）"""
+    converter = JSONLToSQLiteConverter(db_path, jsonl_dir, commit_interval, insert_batch_size,
+                                       unsafe_bulk_load=unsafe_bulk_load)
+    try:
+        converter.connect_db()
+        converter.create_tables()
+        converter._process_language(language)
+    finally:
+        converter.close()
+        for handler in logging.getLogger().handlers:
+            handler.flush()
+
+
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="Convert GitHub PR JSONL files into a SQLite database")
+    parser.add_argument(
+        '--unsafe-bulk-load', action='store_true',
+        help="disable journaling, fsync and foreign key checks while importing (re-run from scratch if interrupted)"
+    )
+    parser.add_argument(
+        '--verify', action='store_true',
+        help="query the actual row count of every table after the import"
+    )
+    args = parser.parse_args()
+    
     # 配置参数
     languages = ['python',
     # 'javascript',
@@ -830,7 +1394,11 @@ def main():
 
     converter = JSONLToSQLiteConverter(
         db_path="github_pr_data.db",
-        jsonl_dir="github_pr_data"
+        jsonl_dir="github_pr_data",
+        # 每种语言一个进程，但不超过 CPU 核数（单核时按顺序导入，省去分片合并）
+        max_workers=min(len(languages), os.cpu_count() or 1),
+        unsafe_bulk_load=args.unsafe_bulk_load,
+        verify_counts=args.verify
     )
     
     converter.run(languages)
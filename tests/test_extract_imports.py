@@ -0,0 +1,38 @@
+"""MultiLanguageSemanticAnalyzer.extract_imports 的回归测试"""
+
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from crawler import MultiLanguageSemanticAnalyzer  # noqa: E402
+
+
+# 超过 IMPORT_REGION_MAX_GAP 行的块注释许可证头
+LICENSE_HEADER = '/*\n' + ''.join(
+    f' * Licensed under the Apache License, line {i}\n'
+    for i in range(MultiLanguageSemanticAnalyzer.IMPORT_REGION_MAX_GAP + 10)
+) + ' */\n'
+
+
+class ExtractImportsTest(unittest.TestCase):
+    def module_names(self, content: str, language: str):
+        return [item['module_name'] for item in MultiLanguageSemanticAnalyzer.extract_imports(content, language)]
+
+    def test_java_imports_after_long_license_header(self):
+        content = LICENSE_HEADER + 'package x;\n\nimport java.util.List;\nimport static java.lang.Math.max;\n\nclass A {}\n'
+        self.assertEqual(self.module_names(content, 'java'), ['java.util.List', 'java.lang.Math.max'])
+
+    def test_javascript_imports_after_long_license_header(self):
+        content = LICENSE_HEADER + "import React from 'react';\nconst fs = require('fs');\n"
+        self.assertEqual(self.module_names(content, 'javascript'), ['react', 'fs'])
+
+    def test_import_region_ends_after_long_code_gap(self):
+        code = ''.join(f'int x{i} = {i};\n' for i in range(MultiLanguageSemanticAnalyzer.IMPORT_REGION_MAX_GAP))
+        content = 'import a.B;\n' + code + 'import c.D;\n'
+        self.assertEqual(self.module_names(content, 'java'), ['a.B'])
+
+
+if __name__ == '__main__':
+    unittest.main()
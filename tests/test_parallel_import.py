@@ -0,0 +1,87 @@
+"""并行分片导入与顺序导入结果一致性的回归测试"""
+
+import json
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from jsonl_to_sqlite import JSONLToSQLiteConverter  # noqa: E402
+
+
+# 导入时写入当前时间的列，比较时忽略
+VOLATILE_COLUMNS = {'repositories': {'created_at'}, 'file_imports': {'last_updated'}}
+
+
+def write_language(jsonl_dir: Path, language: str, repos):
+    """为一种语言写出各类 JSONL 文件：每个仓库一个 PR、一个 commit、两个文件变更及其子记录"""
+    records = {record_type: [] for record_type in (
+        'pr_data', 'commits', 'file_changes', 'function_changes',
+        'class_changes', 'diff_hunks', 'imports', 'review_comments'
+    )}
+    for repo in repos:
+        key = {'repo_full_name': repo, 'pr_number': 1}
+        records['pr_data'].append({**key, 'repo_language': language, 'repo_stars': 1, 'pr_title': 't',
+                                   'pr_stats': {'additions': 1, 'deletions': 1}})
+        commit = {**key, 'commit_hash': f'{repo}-c1'}
+        records['commits'].append({**commit, 'commit_message': 'm'})
+        for file_path in ('a.py', 'b.py'):
+            file_key = {**commit, 'file_path': file_path}
+            records['file_changes'].append({**file_key, 'change_type': 'modified', 'file_language': language})
+            records['function_changes'].append({**file_key, 'function_name': f'{language}_f', 'change_type': 'added'})
+            records['class_changes'].append({**file_key, 'class_name': f'{language}_C', 'change_type': 'added'})
+            records['diff_hunks'].append({**file_key, 'hunk_index': 0, 'old_start': 1, 'old_count': 1,
+                                          'new_start': 1, 'new_count': 1, 'content': '+x'})
+            records['imports'].append({**file_key, 'import_statement': 'import os', 'module_name': 'os'})
+        records['review_comments'].append({**key, 'comment_type': 'review', 'reviewer': 'r'})
+
+    for record_type, rows in records.items():
+        with open(jsonl_dir / f'{language}_{record_type}.jsonl', 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row) + '\n')
+
+
+def dump_database(db_path: Path):
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )]
+        dump = {}
+        for table in tables:
+            columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")
+                       if row[1] not in VOLATILE_COLUMNS.get(table, ())]
+            dump[table] = conn.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY id").fetchall()
+        return dump
+    finally:
+        conn.close()
+
+
+class ParallelImportTest(unittest.TestCase):
+    def test_parallel_import_matches_sequential_import(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            jsonl_dir = tmp / 'data'
+            jsonl_dir.mkdir()
+            # shared/repo 在两种语言中都出现：同一 commit 的同一文件在两个分片中各有一条 file_changes 记录
+            write_language(jsonl_dir, 'python', ['py/a', 'shared/repo'])
+            write_language(jsonl_dir, 'javascript', ['shared/repo', 'js/b'])
+            languages = ['python', 'javascript']
+
+            dumps = []
+            for max_workers in (1, 2):
+                db_path = tmp / f'workers{max_workers}.db'
+                JSONLToSQLiteConverter(str(db_path), str(jsonl_dir), max_workers=max_workers).run(languages)
+                dumps.append(dump_database(db_path))
+
+            sequential, parallel = dumps
+            self.assertEqual(len(sequential['file_changes']), 8)
+            for table in sequential:
+                self.assertEqual(sequential[table], parallel[table], table)
+
+
+if __name__ == '__main__':
+    unittest.main()